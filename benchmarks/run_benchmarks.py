@@ -0,0 +1,225 @@
+"""
+Installer Benchmarks
+
+Times every stage of the installer pipeline, the exporter and the tools on a synthetic mod (see synthetic_mod.py),
+separately and end to end, and stores the results as JSON so runs of different commits can be compared.
+
+Stages:
+- extract_cold / extract_warm: mod_data_extractor.extract_files without / with a filled extraction cache
+- scan / scan_incremental_warm: process_json_files, full scan and incremental scan with an unchanged manifest
+- calculate: calculate_actual_paths_for_assets
+- copy_cold / copy_warm: copy_assets into a fresh VCMI mod folder / again with everything up to date
+- end_to_end: vcmi_mod_assets_installer.py as a subprocess with its own settings.ini, fresh out/ folder
+- export_folder / export_zip: vcmi_mod_assets_exporter copy_files / export_zip
+- tools_statistics: tools/statistics_for_mod_files.main
+- tools_overridden_index: tools/create_overridden_assets_files.index_files_on_disk
+
+CPU time is the time of the benchmark process only, work done by worker processes is not included.
+
+Usage:
+python run_benchmarks.py [--mods 5] [--json_files 20] [--references 30] [--assets 500] [--workers 1] [--repeat 3]
+                         [--output results/my_run.json] [--compare results/previous_run.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from synthetic_mod import generate_synthetic_mod, add_parameter_arguments, parameters_from_args, ARCHIVE_NAMES
+
+REPOSITORY_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTALLER_FOLDER = os.path.join(REPOSITORY_FOLDER, 'vcmi_mod_assets_installer')
+EXPORTER_FOLDER = os.path.join(REPOSITORY_FOLDER, 'vcmi_mod_assets_exporter')
+TOOLS_FOLDER = os.path.join(REPOSITORY_FOLDER, 'tools')
+
+for folder in (INSTALLER_FOLDER, EXPORTER_FOLDER, TOOLS_FOLDER):
+    sys.path.insert(0, folder)
+
+from mod_data_extractor import extract_files
+from extract_resources_and_their_relative_paths import process_json_files
+from calculate_actual_relative_paths_for_assets import calculate_actual_paths_for_assets
+from copy_mod_files import copy_assets
+import statistics_for_mod_files
+from create_overridden_assets_files import index_files_on_disk
+import vcmi_mod_assets_exporter
+
+# Output of the measured stages is discarded unless --verbose is given
+DEVNULL = open(os.devnull, 'w')
+
+INSTALLER_SETTINGS = """[Paths]
+mod_data_folder = {mod_data_folder}
+vcmi_mod_folder = {vcmi_mod_folder}
+
+[Archives]
+files = {archive_names}
+
+[Extraction]
+workers = {workers}
+
+[Scan]
+workers = {workers}
+"""
+
+
+def time_stage(stages, name, function, *args, verbose=False):
+    """Run function(*args), store its wall and CPU time in stages[name] and return its result."""
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(DEVNULL):
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        result = function(*args)
+        stages[name] = {"wall_seconds": time.perf_counter() - start_wall, "cpu_seconds": time.process_time() - start_cpu}
+    print(f"{name:<24} {stages[name]['wall_seconds']:8.3f} s wall {stages[name]['cpu_seconds']:8.3f} s cpu")
+    return result
+
+
+def run_installer_subprocess(run_folder, data_folder, vcmi_folder, workers):
+    """Run the complete installer like a user does: settings.ini in the current folder, out/ created there."""
+    with open(os.path.join(run_folder, 'settings.ini'), 'w') as settings_file:
+        settings_file.write(INSTALLER_SETTINGS.format(mod_data_folder=data_folder, vcmi_mod_folder=vcmi_folder,
+                                                      archive_names=', '.join(ARCHIVE_NAMES), workers=workers))
+    subprocess.run([sys.executable, os.path.join(INSTALLER_FOLDER, 'vcmi_mod_assets_installer.py')],
+                   cwd=run_folder, check=True, stdout=subprocess.DEVNULL)
+
+
+def run_stages(work_folder, data_folder, pristine_vcmi_folder, workers, verbose=False):
+    """Run all stages once in a fresh run folder. Returns {stage name: {wall_seconds, cpu_seconds}}."""
+    stages = {}
+    run_folder = tempfile.mkdtemp(prefix='run_', dir=work_folder)
+    out_folder = os.path.join(run_folder, 'out')
+    mod_data_folder = os.path.join(out_folder, 'mod_data')
+    cache_path = os.path.join(out_folder, 'extraction_cache.json')
+    raw_mapping_path = os.path.join(out_folder, 'assets_to_paths_mapping_raw.txt')
+    mapping_path = os.path.join(out_folder, 'assets_to_paths_mapping.txt')
+    manifest_path = os.path.join(out_folder, 'json_scan_manifest.json')
+    vcmi_folder = os.path.join(run_folder, 'vcmi')
+    shutil.copytree(pristine_vcmi_folder, vcmi_folder)
+    os.makedirs(out_folder)
+
+    time_stage(stages, 'extract_cold', extract_files, data_folder, ARCHIVE_NAMES, mod_data_folder, None, workers, cache_path, verbose=verbose)
+    time_stage(stages, 'extract_warm', extract_files, data_folder, ARCHIVE_NAMES, mod_data_folder, None, workers, cache_path, verbose=verbose)
+
+    time_stage(stages, 'scan', process_json_files, vcmi_folder, raw_mapping_path, workers, verbose=verbose)
+    # The incremental scan needs a filled manifest first, only the second (unchanged) scan is measured
+    with contextlib.redirect_stdout(DEVNULL):
+        process_json_files(vcmi_folder, raw_mapping_path + '.tmp', workers, manifest_path)
+    time_stage(stages, 'scan_incremental_warm', process_json_files, vcmi_folder, raw_mapping_path + '.tmp', workers, manifest_path, verbose=verbose)
+
+    time_stage(stages, 'calculate', calculate_actual_paths_for_assets, raw_mapping_path, mapping_path, verbose=verbose)
+    time_stage(stages, 'copy_cold', copy_assets, mapping_path, mod_data_folder, vcmi_folder, verbose=verbose)
+    time_stage(stages, 'copy_warm', copy_assets, mapping_path, mod_data_folder, vcmi_folder, verbose=verbose)
+
+    end_to_end_folder = os.path.join(run_folder, 'end_to_end')
+    shutil.copytree(pristine_vcmi_folder, os.path.join(end_to_end_folder, 'vcmi'))
+    time_stage(stages, 'end_to_end', run_installer_subprocess, end_to_end_folder, data_folder,
+               os.path.join(end_to_end_folder, 'vcmi'), workers, verbose=verbose)
+
+    time_stage(stages, 'export_folder', vcmi_mod_assets_exporter.copy_files, vcmi_folder, os.path.join(run_folder, 'export'), verbose=verbose)
+    time_stage(stages, 'export_zip', vcmi_mod_assets_exporter.export_zip, vcmi_folder, os.path.join(run_folder, 'export.zip'), verbose=verbose)
+
+    statistics_outputs = [os.path.join(run_folder, name) for name in
+                          ('missing_files.txt', 'files_without_entries.txt', 'intersection_files.txt', 'coverage_report.json')]
+    time_stage(stages, 'tools_statistics', statistics_for_mod_files.main, mapping_path, mod_data_folder, *statistics_outputs, verbose=verbose)
+
+    mod_paths = [os.path.join('Mods', mod_name, 'Content') for mod_name in sorted(os.listdir(os.path.join(vcmi_folder, 'Mods')))]
+    time_stage(stages, 'tools_overridden_index', index_files_on_disk, vcmi_folder, mod_paths, workers, verbose=verbose)
+
+    shutil.rmtree(run_folder)
+    return stages
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY_FOLDER, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize_runs(runs):
+    """Merge the stage timings of all runs: best wall time (least disturbed run) plus every single run."""
+    stages = {}
+    for name in runs[0]:
+        wall_times = [run[name]["wall_seconds"] for run in runs]
+        cpu_times = [run[name]["cpu_seconds"] for run in runs]
+        stages[name] = {"wall_seconds": min(wall_times), "cpu_seconds": min(cpu_times), "wall_seconds_runs": wall_times}
+    return stages
+
+
+def print_comparison(results, previous_results_path):
+    with open(previous_results_path, 'r', encoding='utf-8') as previous_file:
+        previous_results = json.load(previous_file)
+    print(f"Compared to {previous_results_path} (commit {previous_results.get('commit')}):")
+    for name, stage in results["stages"].items():
+        previous_stage = previous_results.get("stages", {}).get(name)
+        if not previous_stage or not previous_stage["wall_seconds"]:
+            print(f"{name:<24} new")
+            continue
+        ratio = stage["wall_seconds"] / previous_stage["wall_seconds"]
+        print(f"{name:<24} {previous_stage['wall_seconds']:8.3f} s -> {stage['wall_seconds']:8.3f} s ({ratio:.2f}x)")
+    if results["parameters"] != previous_results.get("parameters"):
+        print("Warning: the runs used different synthetic mod parameters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all installer stages on a synthetic mod.")
+    add_parameter_arguments(parser)
+    parser.add_argument('--workers', type=int, default=1, help="Workers for extraction, scan and tools stages.")
+    parser.add_argument('--repeat', type=int, default=1, help="Number of runs, the best wall time per stage is reported.")
+    parser.add_argument('--work_folder', type=str, default=None, help="Folder for the synthetic mod (default: temporary folder, removed afterwards).")
+    parser.add_argument('--output', type=str, default=None, help="Results file (default: results/<date>_<commit>.json).")
+    parser.add_argument('--compare', type=str, default=None, help="Earlier results file to compare with.")
+    parser.add_argument('--verbose', action='store_true', help="Show the output of the measured stages.")
+    args = parser.parse_args()
+
+    parameters = parameters_from_args(args)
+    work_folder = args.work_folder or tempfile.mkdtemp(prefix='vcmi_benchmark_')
+    os.makedirs(work_folder, exist_ok=True)
+
+    try:
+        print(f"Generating synthetic mod in: {work_folder}")
+        generation_start = time.perf_counter()
+        data_folder, vcmi_folder, summary = generate_synthetic_mod(work_folder, parameters)
+        print(f"Generated {summary['assets']} assets, {summary['json_files']} JSON files, {summary['references']} references "
+              f"in {time.perf_counter() - generation_start:.1f} s")
+
+        runs = []
+        for run_number in range(args.repeat):
+            print(f"Run {run_number + 1} of {args.repeat}")
+            runs.append(run_stages(work_folder, data_folder, vcmi_folder, args.workers, args.verbose))
+    finally:
+        if not args.work_folder:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    commit = get_git_commit()
+    results = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "parameters": parameters._asdict(),
+        "generated": summary,
+        "stages": summarize_runs(runs),
+    }
+
+    output_path = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                              f"{time.strftime('%Y%m%d_%H%M%S')}_{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to: {output_path}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
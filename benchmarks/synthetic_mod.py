@@ -0,0 +1,232 @@
+"""
+Synthetic Mod Generator
+
+Creates a synthetic original H3 mod (archives + mp3 folder) and a matching synthetic VCMI mod collection, so every
+stage of the installer, the exporter and the tools can be measured on a plain Linux box without game data.
+
+Generated layout (inside <work folder>):
+- h3_mod/Data/h3bench.pac, h3bench.snd, h3bench.vid   Archives with .def, .pcx, .wav, .bik and .txt entries
+- h3_mod/mp3/                                          Music files
+- vcmi/Mods/bench_<n>/Content/config/**/*.json         JSON files referencing the assets (some with JSON5 comments)
+- vcmi/Mods/bench_<n>/overridden_assets.txt            A few manually overridden assets per mod
+
+Usage:
+python synthetic_mod.py <work_folder> [--mods 5] [--json_files 20] [--references 30] [--assets 500] ...
+"""
+
+import os
+import json
+import math
+import zlib
+import random
+import struct
+import argparse
+from collections import namedtuple
+
+ARCHIVE_NAMES = ['h3bench.pac', 'h3bench.snd', 'h3bench.vid']
+
+SyntheticModParameters = namedtuple('SyntheticModParameters', ['mods', 'json_files', 'references', 'assets', 'asset_size',
+                                                               'comment_density', 'missing_ratio', 'seed'])
+
+DEFAULT_PARAMETERS = SyntheticModParameters(mods=5, json_files=20, references=30, assets=500, asset_size=4096,
+                                            comment_density=0.2, missing_ratio=0.02, seed=1)
+
+# Share of the generated assets per type: (extension, share, archive or 'mp3', folder in the JSON path)
+ASSET_TYPES = [('.def', 0.55, 'h3bench.pac', 'sprites'),
+               ('.pcx', 0.20, 'h3bench.pac', 'data'),
+               ('.wav', 0.15, 'h3bench.snd', 'sounds'),
+               ('.bik', 0.05, 'h3bench.vid', 'video'),
+               ('.mp3', 0.05, 'mp3', 'music')]
+
+
+def _write_lod(path, entries):
+    """Write a LOD archive. entries: list of (name, data, compress)."""
+    header = b'LOD\x00' + struct.pack('<II', 500, len(entries)) + b'\x00' * 80
+    offset = len(header) + 32 * len(entries)
+    table = []
+    payloads = []
+    for name, data, compress in entries:
+        payload = zlib.compress(data) if compress else data
+        table.append(struct.pack('<16sIIII', name.encode('latin-1'), offset, len(data), 0, len(payload) if compress else 0))
+        payloads.append(payload)
+        offset += len(payload)
+    with open(path, 'wb') as archive_file:
+        archive_file.write(header + b''.join(table))
+        for payload in payloads:
+            archive_file.write(payload)
+
+
+def _write_snd(path, entries):
+    """Write a SND archive. entries: list of (name, data), names stored as NAME\\0EXT."""
+    offset = 4 + 48 * len(entries)
+    table = []
+    for name, data in entries:
+        base_name, extension = os.path.splitext(name)
+        table.append(struct.pack('<40sII', (base_name + '\x00' + extension[1:]).encode('latin-1'), offset, len(data)))
+        offset += len(data)
+    with open(path, 'wb') as archive_file:
+        archive_file.write(struct.pack('<I', len(entries)) + b''.join(table))
+        for _, data in entries:
+            archive_file.write(data)
+
+
+def _write_vid(path, entries):
+    """Write a VID archive. entries: list of (name, data), sizes are implied by the offsets."""
+    offset = 4 + 44 * len(entries)
+    table = []
+    for name, data in entries:
+        table.append(struct.pack('<40sI', name.encode('latin-1'), offset))
+        offset += len(data)
+    with open(path, 'wb') as archive_file:
+        archive_file.write(struct.pack('<I', len(entries)) + b''.join(table))
+        for _, data in entries:
+            archive_file.write(data)
+
+
+def _asset_data(rng, size):
+    # Half random, half repeated bytes, so compression has some but not too much effect
+    random_part = rng.randbytes(size // 2)
+    return random_part + random_part[:16] * ((size - len(random_part)) // 16 + 1)
+
+
+def _pcx_image(rng, size):
+    """8 bit paletted H3 pcx image of about `size` bytes."""
+    width = height = max(1, int(math.sqrt(size)))
+    return struct.pack('<III', width * height, width, height) + rng.randbytes(width * height) + bytes(range(256)) * 3
+
+
+def generate_h3_mod(h3_mod_folder, parameters):
+    """Write the synthetic archives and mp3 folder. Returns {asset type extension: [file names]} of the generated assets."""
+    rng = random.Random(parameters.seed)
+    data_folder = os.path.join(h3_mod_folder, 'Data')
+    mp3_folder = os.path.join(h3_mod_folder, 'mp3')
+    os.makedirs(data_folder, exist_ok=True)
+    os.makedirs(mp3_folder, exist_ok=True)
+
+    lod_entries = [('README.TXT', b'unwanted', False)]
+    snd_entries = []
+    vid_entries = []
+    assets = {}
+    for extension, share, archive, _ in ASSET_TYPES:
+        names = [f'B{extension[1:].upper()}{number:05d}{extension}' for number in range(max(1, int(parameters.assets * share)))]
+        assets[extension] = names
+        for name in names:
+            if extension == '.pcx':
+                lod_entries.append((name, _pcx_image(rng, parameters.asset_size), rng.random() < 0.5))
+            elif archive == 'h3bench.pac':
+                lod_entries.append((name, _asset_data(rng, parameters.asset_size), rng.random() < 0.5))
+            elif archive == 'h3bench.snd':
+                snd_entries.append((name, _asset_data(rng, parameters.asset_size)))
+            elif archive == 'h3bench.vid':
+                vid_entries.append((name, _asset_data(rng, parameters.asset_size * 4)))
+            else:
+                with open(os.path.join(mp3_folder, name), 'wb') as mp3_file:
+                    mp3_file.write(_asset_data(rng, parameters.asset_size * 2))
+
+    _write_lod(os.path.join(data_folder, 'h3bench.pac'), lod_entries)
+    _write_snd(os.path.join(data_folder, 'h3bench.snd'), snd_entries)
+    _write_vid(os.path.join(data_folder, 'h3bench.vid'), vid_entries)
+    return assets
+
+
+def _asset_reference(rng, assets, parameters):
+    """Return a JSON asset value, e.g. "sprites/BDEF00012.def" or "data/BPCX00003.bmp"."""
+    extension, _, _, folder = rng.choices(ASSET_TYPES, weights=[share for _, share, _, _ in ASSET_TYPES])[0]
+    if rng.random() < parameters.missing_ratio:
+        return f'{folder}/MISSING{rng.randrange(100000):05d}{extension}'
+    name = rng.choice(assets[extension])
+    if extension == '.pcx':
+        # JSON files reference images as .bmp or .png, both are installed as .png
+        return f'{folder}/{os.path.splitext(name)[0]}{rng.choice([".bmp", ".png"])}'
+    if extension == '.def' and rng.random() < 0.3:
+        return f'{folder}/{os.path.splitext(name)[0]}'  # .def is added when the extension is missing
+    return f'{folder}/{name}'
+
+
+def _json_document(rng, assets, parameters, with_comments):
+    """Return the text of a JSON file with `references` asset values spread over nested objects."""
+    objects = {}
+    for number in range(parameters.references):
+        objects[f'object{number}'] = {
+            'name': f'Object {number}',
+            'value': rng.randrange(10000),
+            'graphics': {'animation': _asset_reference(rng, assets, parameters), 'scale': [1, 2, 3]},
+        }
+    text = json.dumps(objects, indent=4)
+    if not with_comments:
+        return text
+
+    # JSON5 style: line comments and trailing commas, handled by the comment stripping parser tier
+    lines = []
+    for line in text.splitlines():
+        lines.append(line)
+        if line.strip().startswith('"value"'):
+            lines.append('        // synthetic comment')
+    return '// Synthetic VCMI mod file\n' + '\n'.join(lines).replace('\n    }\n}', '\n    },\n}')
+
+
+def generate_vcmi_mods(vcmi_folder, assets, parameters):
+    """Write the synthetic VCMI mods. Returns the number of generated JSON files."""
+    rng = random.Random(parameters.seed + 1)
+    json_file_count = 0
+    for mod_number in range(parameters.mods):
+        mod_folder = os.path.join(vcmi_folder, 'Mods', f'bench_{mod_number}')
+        config_folder = os.path.join(mod_folder, 'Content', 'config')
+        os.makedirs(mod_folder, exist_ok=True)
+        with open(os.path.join(mod_folder, 'mod.json'), 'w') as mod_file:
+            json.dump({'name': f'Benchmark mod {mod_number}', 'version': '1.0'}, mod_file)
+
+        for file_number in range(parameters.json_files):
+            # A few sub folders per mod, like real mods (creatures/, objects/, ...)
+            folder = os.path.join(config_folder, f'group{file_number % 4}')
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, f'file{file_number}.json'), 'w', encoding='utf-8') as json_file:
+                json_file.write(_json_document(rng, assets, parameters, rng.random() < parameters.comment_density))
+            json_file_count += 1
+
+        # Manually overridden assets, installed to a fixed place of the mod
+        with open(os.path.join(mod_folder, 'overridden_assets.txt'), 'w') as overridden_file:
+            for name in rng.sample(assets['.def'], min(3, len(assets['.def']))):
+                relative_path = os.path.join('Mods', f'bench_{mod_number}', 'Content', 'Sprites', 'overridden', name)
+                overridden_file.write(f'"{relative_path}" : "{name}"\n')
+    return json_file_count
+
+
+def generate_synthetic_mod(work_folder, parameters=DEFAULT_PARAMETERS):
+    """Generate the synthetic H3 mod and VCMI mods. Returns (h3 mod data folder, vcmi folder, summary dict)."""
+    h3_mod_folder = os.path.join(work_folder, 'h3_mod')
+    vcmi_folder = os.path.join(work_folder, 'vcmi')
+    assets = generate_h3_mod(h3_mod_folder, parameters)
+    json_file_count = generate_vcmi_mods(vcmi_folder, assets, parameters)
+    summary = {"assets": sum(len(names) for names in assets.values()), "json_files": json_file_count,
+               "references": json_file_count * parameters.references}
+    return os.path.join(h3_mod_folder, 'Data'), vcmi_folder, summary
+
+
+def add_parameter_arguments(parser):
+    """Add the generator parameters as command line options (shared with run_benchmarks.py)."""
+    parser.add_argument('--mods', type=int, default=DEFAULT_PARAMETERS.mods, help="Number of VCMI mods.")
+    parser.add_argument('--json_files', type=int, default=DEFAULT_PARAMETERS.json_files, help="JSON files per mod.")
+    parser.add_argument('--references', type=int, default=DEFAULT_PARAMETERS.references, help="Asset references per JSON file.")
+    parser.add_argument('--assets', type=int, default=DEFAULT_PARAMETERS.assets, help="Number of assets in the synthetic archives.")
+    parser.add_argument('--asset_size', type=int, default=DEFAULT_PARAMETERS.asset_size, help="Approximate asset size in bytes.")
+    parser.add_argument('--comment_density', type=float, default=DEFAULT_PARAMETERS.comment_density,
+                        help="Share of JSON files with comments and trailing commas (0-1).")
+    parser.add_argument('--missing_ratio', type=float, default=DEFAULT_PARAMETERS.missing_ratio,
+                        help="Share of references to assets which do not exist (0-1).")
+    parser.add_argument('--seed', type=int, default=DEFAULT_PARAMETERS.seed, help="Random seed, same seed gives the same mod.")
+
+
+def parameters_from_args(args):
+    return SyntheticModParameters(*(getattr(args, field) for field in SyntheticModParameters._fields))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic H3 mod and matching VCMI mods.")
+    parser.add_argument('work_folder', help="Folder the synthetic mods are written to.")
+    add_parameter_arguments(parser)
+    args = parser.parse_args()
+
+    data_folder, vcmi_folder, summary = generate_synthetic_mod(args.work_folder, parameters_from_args(args))
+    print(f"Generated {summary['assets']} assets in {data_folder} and {summary['json_files']} JSON files "
+          f"({summary['references']} references) in {vcmi_folder}")
@@ -1,48 +1,30 @@
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# The mapping format is shared with the installer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'vcmi_mod_assets_installer'))
+from asset_mapping import iter_mapping_file
+
 
 def parse_file(input_file):
-    current_mod = None
-    mod_added = set()  # Keep track of mods for which comments are already added
     mod_file_list = {}  # Dictionary to store files listed under each mod
 
-    with open(input_file, 'r') as infile:
-        for line in infile:
-            # Check if the line is a source file comment
-            if line.startswith("// Source file:"):
-                # Extract the path of the source file
-                source_path = line.split(":", 1)[1].strip()
-
-                # Get the last occurrence of the relative mod path up to "\Content\"
-                content_marker = r"\Content"
-                if content_marker in source_path:
-                    # Find the last occurrence of "\Content\" and get the mod path up to there
-                    mod_path = source_path[:source_path.rfind(content_marker) + len(content_marker)]
-
-                    # If we're in a new mod group and it's not added yet, insert the mod meta-comment
-                    if mod_path != current_mod and mod_path not in mod_added:
-                        current_mod = mod_path
-                        mod_added.add(mod_path)
-                        # Initialize file list for this mod
-                        mod_file_list[current_mod] = set()
-
-            # If it's a regular line (not a comment), extract the file name
-            elif ":" in line and '"' in line:
-                # Extract the part after the last colon and before the comma, then remove quotes and spaces
-                right_part = line.split(":")[-1].strip()  # Get the right part after the colon
-                if right_part.endswith(','):
-                    right_part = right_part[:-1]  # Remove trailing comma if it exists
-
-                # Extract the filename from within quotes
-                listed_file = right_part.strip('"').strip()  # Remove quotes and extra spaces
-
-                if current_mod:
-                    mod_file_list[current_mod].add(listed_file)
+    for source_path, _, listed_file in iter_mapping_file(input_file):
+        # Get the last occurrence of the relative mod path up to "\Content\"
+        content_marker = r"\Content"
+        if not source_path or content_marker not in source_path:
+            continue
+
+        # Find the last occurrence of "\Content\" and get the mod path up to there
+        mod_path = source_path[:source_path.rfind(content_marker) + len(content_marker)]
+        mod_file_list.setdefault(mod_path, set()).add(listed_file)
 
     return mod_file_list
 
 
 def list_files_on_disk(mod_base_path, mod_path):
-    """Walk the mod folder and collect all file names and their relative paths, excluding .json and .txt files."""
+    """Scan the mod folder and collect all file names and their relative paths, excluding .json and .txt files."""
     full_mod_path = os.path.join(mod_base_path, mod_path)
     file_list = set()
 
@@ -51,35 +33,81 @@ def list_files_on_disk(mod_base_path, mod_path):
         print(f"Warning: Mod path '{full_mod_path}' does not exist.")
         return file_list
 
-    # Recursively collect files, excluding .json and .txt files
-    for root, dirs, files in os.walk(full_mod_path):
-        for file in files:
-            if file.endswith('.bmp'):
-                # Full path of the original .bmp file
-                bmp_file_path = os.path.join(root, file)
-            
-                # New file path with '.png' extension
-                file = file[:-4] + '.png'
-
-            # Exclude .json, .txt and.pdn files
-            if not file.endswith('.json') and not file.endswith('.txt') and not file.endswith('.pdn'):
-                # Get the relative path to the mod base path
-                relative_path = os.path.relpath(os.path.join(root, file), mod_base_path)  # Relative path to the base path
-                # Store the tuple (relative path, filename)
-                file_list.add((relative_path, file))  # Add a tuple containing relative path and filename
+    # Recursively collect files with os.scandir, excluding .json, .txt and .pdn files
+    relative_folders = [os.path.relpath(full_mod_path, mod_base_path)]
+    while relative_folders:
+        relative_folder = relative_folders.pop()
+        with os.scandir(os.path.join(mod_base_path, relative_folder)) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    relative_folders.append(os.path.join(relative_folder, entry.name))
+                    continue
+
+                file = entry.name
+                if file.endswith('.bmp'):
+                    # Listed with '.png' extension, the installer converts .bmp references to .png
+                    file = file[:-4] + '.png'
+                if not file.endswith('.json') and not file.endswith('.txt') and not file.endswith('.pdn'):
+                    # Store the tuple (relative path to the mod base path, filename)
+                    file_list.add((os.path.join(relative_folder, file), file))
     return file_list
 
 
-def find_overridden_assets(mod_file_list, mod_base_path):
-    for mod_path, listed_files in mod_file_list.items():
-        # List actual files on disk in the mod folder
-        actual_files = list_files_on_disk(mod_base_path, mod_path)
+def find_scan_roots(mod_paths):
+    """Return the mod paths which are not inside another mod path, so every subtree is scanned only once."""
+    scan_roots = []
+    for mod_path in sorted({os.path.normpath(mod_path) for mod_path in mod_paths}):
+        if not scan_roots or not mod_path.startswith(scan_roots[-1] + os.sep):
+            scan_roots.append(mod_path)
+    return scan_roots
+
+
+def index_files_on_disk(mod_base_path, mod_paths, workers=1):
+    """Scan every mod folder once (in parallel with workers > 1). Returns {mod path: set of (relative path, filename)}."""
+    scan_roots = find_scan_roots(mod_paths)
+    if workers > 1 and len(scan_roots) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(scan_roots))) as executor:
+            root_files = dict(zip(scan_roots, executor.map(list_files_on_disk, [mod_base_path] * len(scan_roots), scan_roots)))
+    else:
+        root_files = {scan_root: list_files_on_disk(mod_base_path, scan_root) for scan_root in scan_roots}
+
+    files_on_disk = {}
+    for mod_path in mod_paths:
+        normalized_path = os.path.normpath(mod_path)
+        if normalized_path in root_files:
+            files_on_disk[mod_path] = root_files[normalized_path]
+            continue
+        # Mod nested inside another mod folder: take its part of the outer scan
+        scan_root = next(root for root in scan_roots if normalized_path.startswith(root + os.sep))
+        prefix = os.path.relpath(os.path.join(mod_base_path, normalized_path), mod_base_path) + os.sep
+        files_on_disk[mod_path] = {file_tuple for file_tuple in root_files[scan_root] if file_tuple[0].startswith(prefix)}
+    return files_on_disk
+
+
+def write_if_changed(file_path, content):
+    """Write content to file_path unless the file already has exactly this content. Returns True if written."""
+    try:
+        with open(file_path, 'r') as existing_file:
+            if existing_file.read() == content:
+                return False
+    except OSError:
+        pass
+
+    with open(file_path, 'w') as outfile:
+        outfile.write(content)
+    return True
+
+
+def find_overridden_assets(mod_file_list, mod_base_path, workers=1):
+    files_on_disk = index_files_on_disk(mod_base_path, list(mod_file_list), workers)
+    written = unchanged = 0
 
-        # Create a set of filenames from listed_files for comparison
-        listed_filenames_set = set(listed_files)  # Use listed_files directly as a set for comparison
+    for mod_path, listed_files in mod_file_list.items():
+        # Actual files on disk in the mod folder
+        actual_files = files_on_disk[mod_path]
 
         # Find files on disk but not listed in the input file (compare only the second entry, which is the filename)
-        overridden_files = {file_tuple for file_tuple in actual_files if file_tuple[1] not in listed_filenames_set}
+        overridden_files = {file_tuple for file_tuple in actual_files if file_tuple[1] not in listed_files}
 
         # Sort the overridden files by their relative paths to prevent interleaving
         sorted_overridden_files = sorted(overridden_files, key=lambda x: x[0])
@@ -96,20 +124,24 @@ def find_overridden_assets(mod_file_list, mod_base_path):
             mod_folder = os.path.dirname(mod_output_path)
             os.makedirs(mod_folder, exist_ok=True)
 
-            with open(mod_output_path, 'w') as outfile:
-                for relative_path, file_name in sorted_overridden_files:
-                    # Write the full relative path and the file name
-                    outfile.write(f'"{relative_path}" : "{file_name}"\n')
+            # Write the full relative path and the file name, unchanged files are not touched
+            content = "".join(f'"{relative_path}" : "{file_name}"\n' for relative_path, file_name in sorted_overridden_files)
+            if write_if_changed(mod_output_path, content):
+                written += 1
+            else:
+                unchanged += 1
 
+    print(f"overridden_assets.txt files written: {written}, unchanged: {unchanged}")
 
 
 if __name__ == "__main__":
     # Default paths
     mod_base_path = r"d:/git/succession_wars_overridden_assets_tests"  # Default mod base path
     input_file = r"d:/temp/Krs/Python/VCMI_mod_assets_scripts/vcmi_mod_assets_installer/dist/out/assets_to_paths_mapping.txt"  # Default input file
+    workers = os.cpu_count() or 1  # Mod folders scanned in parallel
 
     # Step 1: Parse the input file and collect listed files for each mod
     mod_file_list = parse_file(input_file)
 
     # Step 2: Find overridden assets and save to individual files in each mod folder
-    find_overridden_assets(mod_file_list, mod_base_path)
+    find_overridden_assets(mod_file_list, mod_base_path, workers)
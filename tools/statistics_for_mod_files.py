@@ -1,40 +1,52 @@
 import os
-import re
+import sys
+import json
+
+# The mapping format is shared with the installer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'vcmi_mod_assets_installer'))
+from asset_mapping import iter_mapping_file
+
 
 def read_input_file(input_file_path):
     """Read the input file and extract the file names and their paths, ignoring comment lines."""
-    file_entries = []
-    with open(input_file_path, 'r') as file:
-        for line in file:
-            line = line.strip()  # Remove leading/trailing whitespace
-            # Skip lines starting with //
-            if line.startswith('//'):
-                continue
-            
-            # Match the pattern and extract the first and second entries
-            match = re.match(r'^\s*"([^"]*)"\s*:\s*"([^"]+)"', line)
-            if match:
-                file_entries.append((match.group(1), match.group(2)))  # (first entry, second entry)
-            else:
-                print(f"Warning: Line did not match expected format: {line}")
-    return file_entries
-
-
-def check_files_in_directory(file_entries, directory):
-    """Check for existence of files in the given directory and return missing files with their paths."""
-    missing_files = [(first_entry, second_entry) for first_entry, second_entry in file_entries if not os.path.exists(os.path.join(directory, second_entry))]
-    return missing_files
-
-
-def list_all_files_in_directory(directory):
-    """List all files in the given directory."""
-    return [file for file in os.listdir(directory) if os.path.isfile(os.path.join(directory, file))]
+    # (first entry, second entry) of every line, lines in another format are reported
+    return [(path, file_name) for _, path, file_name in iter_mapping_file(input_file_path)]
+
+
+def index_directory(directory):
+    """List all files in the given directory with a single scan. Returns {lower case name: [names on disk]}.
+
+    On case-sensitive file systems several files can differ only in case, all of them are kept (sorted).
+    """
+    directory_index = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                directory_index.setdefault(entry.name.lower(), []).append(entry.name)
+    for names in directory_index.values():
+        names.sort()
+    return directory_index
+
+
+def check_files_in_directory(file_entries, directory_index):
+    """Return the entries whose file does not exist in the directory index (case-insensitive)."""
+    return [(first_entry, second_entry) for first_entry, second_entry in file_entries if second_entry.lower() not in directory_index]
+
+
+def list_all_files_in_directory(directory_index):
+    """List all files of the directory index in sorted order."""
+    return sorted((name for names in directory_index.values() for name in names), key=str.lower)
+
+
+def find_case_collisions(directory_index):
+    """Return the sorted lists of file names in the directory index which differ only in case."""
+    return sorted(names for names in directory_index.values() if len(names) > 1)
 
 
 def find_files_without_entries(all_files, file_entries):
-    """Find files in the directory that do not have entries in the input."""
-    second_entries = {second_entry for _, second_entry in file_entries}
-    return [file for file in all_files if file not in second_entries]
+    """Find files in the directory that do not have entries in the input (case-insensitive)."""
+    second_entries = {second_entry.lower() for _, second_entry in file_entries}
+    return [file for file in all_files if file.lower() not in second_entries]
 
 
 def normalize_filename(filename):
@@ -42,61 +54,88 @@ def normalize_filename(filename):
     return os.path.splitext(filename)[0]
 
 
-def find_intersection(files1, files2):
-    """Find the intersection of two lists disregarding file extensions, excluding .wav files."""
-    intersection = set()
-    for file1 in files1:
-        for file2 in files2:
-            # Skip if either file has a .wav extension
-            if file1.lower().endswith('.wav') or file2.lower().endswith('.wav'):
-                continue
-            # Compare normalized filenames
-            if normalize_filename(file1) == normalize_filename(file2):
-                intersection.add(normalize_filename(file1))  # Add only the name without extension
-    return intersection
+def find_extension_mismatches(files1, files2):
+    """Pair files of both lists with the same name but another extension (case-insensitive), excluding .wav files.
 
+    Returns sorted (file from files1, file from files2) pairs.
+    """
+    # Index the second list by name without extension, so every file of the first list is a single lookup
+    files2_by_stem = {}
+    for file2 in files2:
+        if not file2.lower().endswith('.wav'):
+            files2_by_stem.setdefault(normalize_filename(file2).lower(), []).append(file2)
 
-def main(input_file_path, directory, missing_files_output, files_without_entries_output, intersection_output):
+    mismatches = set()
+    for file1 in files1:
+        if file1.lower().endswith('.wav'):
+            continue
+        for file2 in files2_by_stem.get(normalize_filename(file1).lower(), []):
+            mismatches.add((file1, file2))
+    return sorted(mismatches)
+
+
+def build_coverage_report(input_file_path, directory, file_entries, directory_index):
+    """Compare the entries of the input file with the files in the directory. Returns the report as a dict."""
+    missing_files = check_files_in_directory(file_entries, directory_index)
+    all_files = list_all_files_in_directory(directory_index)
+    files_without_entries = find_files_without_entries(all_files, file_entries)
+    mismatches = find_extension_mismatches([second_entry for _, second_entry in missing_files], files_without_entries)
+
+    return {
+        "input_file": input_file_path,
+        "directory": directory,
+        "entries": len(file_entries),
+        "files_on_disk": len(all_files),
+        "missing": [{"path": first_entry, "file_name": second_entry} for first_entry, second_entry in missing_files],
+        "unreferenced": files_without_entries,
+        "extension_mismatches": [{"file_name": file_name, "file_on_disk": file_on_disk} for file_name, file_on_disk in mismatches],
+        # Entries matching one of these names match several files, the installer uses the exact case or the first one
+        "case_collisions": find_case_collisions(directory_index),
+    }
+
+
+def main(input_file_path, directory, missing_files_output, files_without_entries_output, intersection_output, json_output=None):
     # Check if the input file exists
     if not os.path.exists(input_file_path):
         print(f"Error: The file '{input_file_path}' does not exist.")
         return
     
-    # Read the input file
+    # Read the input file and scan the directory once
     file_entries = read_input_file(input_file_path)
-    
-    # Check for missing files in the directory
-    missing_files_in_directory = check_files_in_directory(file_entries, directory)
-    
-    # List all files in the directory
-    all_files_in_directory = list_all_files_in_directory(directory)
-    
-    # Find files in the directory that do not have entries in the input file
-    files_without_entries = find_files_without_entries(all_files_in_directory, file_entries)
+    report = build_coverage_report(input_file_path, directory, file_entries, index_directory(directory))
 
     # Write the files without entries to one output file
     with open(files_without_entries_output, 'w') as output_file:
         output_file.write("Files in the Directory that do not exist in the .txt file:\n")
-        for file in files_without_entries:
+        for file in report["unreferenced"]:
             output_file.write(file + '\n')
 
     # Write the missing files with their first entries to another output file
     with open(missing_files_output, 'w') as output_file:
         output_file.write("Files in the .txt file that do not exist on disk:\n")
-        for first_entry, second_entry in missing_files_in_directory:
-            output_file.write(f"{first_entry} : {second_entry}\n")
+        for missing in report["missing"]:
+            output_file.write(f"{missing['path']} : {missing['file_name']}\n")
 
-    # Find intersection of the two lists disregarding extensions and excluding .wav files
-    intersection = find_intersection([second_entry for first_entry, second_entry in missing_files_in_directory],
-                                     files_without_entries)
-
-    # Write the intersection to a new output file
+    # Write the names of the missing files which exist with another extension (excluding .wav files)
+    intersection = sorted({normalize_filename(mismatch["file_name"]) for mismatch in report["extension_mismatches"]})
     with open(intersection_output, 'w') as output_file:
         output_file.write("Intersection of files disregarding extensions (excluding .wav files):\n")
         for file in intersection:
             output_file.write(file + '\n')
 
-    print(f"Results have been written to '{files_without_entries_output}', '{missing_files_output}', and '{intersection_output}'.")
+    output_files = [files_without_entries_output, missing_files_output, intersection_output]
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+        output_files.append(json_output)
+
+    print(f"{report['entries']} entries, {report['files_on_disk']} files on disk: {len(report['missing'])} missing, "
+          f"{len(report['unreferenced'])} unreferenced, {len(report['extension_mismatches'])} extension mismatches")
+    if report["case_collisions"]:
+        print(f"Warning: {len(report['case_collisions'])} file names on disk differ only in case:")
+        for names in report["case_collisions"]:
+            print(f"  {', '.join(names)}")
+    print(f"Results have been written to {', '.join(repr(path) for path in output_files)}.")
 
 
 if __name__ == "__main__":
@@ -106,5 +145,6 @@ if __name__ == "__main__":
     files_without_entries_output = r'd:\temp\Krs\Python\Extract_WoG_relative_paths\files_without_entries.txt'
     missing_files_output = r'd:\temp\Krs\Python\Extract_WoG_relative_paths\missing_files.txt'
     intersection_output = r'd:\temp\Krs\Python\Extract_WoG_relative_paths\intersection_files.txt'
+    json_output = r'd:\temp\Krs\Python\Extract_WoG_relative_paths\coverage_report.json'
 
-    main(input_file_path, directory, missing_files_output, files_without_entries_output, intersection_output)
+    main(input_file_path, directory, missing_files_output, files_without_entries_output, intersection_output, json_output)
@@ -10,26 +10,67 @@ Features:
   - Configuration directories (e.g., 'config')
   - JSON files
   - Documentation files (e.g., 'README.md', 'LICENSE')
+- Exports either to a folder or directly into a zip archive (`<output folder>/<mod folder name>.zip`).
+  Already compressed assets (png, mp3, bik, ...) are stored, all others are deflated on worker threads.
+- Incremental export updating an earlier export folder (only changed assets are copied).
+- The export runs on a background thread with progress and Cancel, the window stays responsive.
+- Headless mode for scripts: `python vcmi_mod_assets_exporter.py --headless [--target zip]`
 
 Output:
 The extracted assets will be saved to the specified output folder.
 """
 
 import os
+import sys
+import queue
 import shutil
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import argparse
+import threading
 import configparser
+import json
+import time
+import hashlib
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from zip_stream_writer import ZipStreamWriter, deflate_file, deflate_data
 
 CONFIG_FILE = "settings.ini"
 
+EXCLUDED_ITEMS = ["config", ".json", ".git", ".gitignore", "README.md", "LICENSE"]
+
+EXPORT_TARGETS = ("folder", "incremental", "zip")
+
+# Formats which are compressed already, deflating them again costs time and gains nothing
+STORED_EXTENSIONS = {'.png', '.mp3', '.bik', '.smk', '.ogg', '.jpg', '.zip'}
+
+# Number of threads deflating files for the zip export
+ZIP_WORKERS = 4
+
+# Written into the output folder by the incremental export
+EXPORT_MANIFEST_NAME = "export_manifest.json"
+EXPORT_MANIFEST_VERSION = 1
+
+# List of removed files in a delta package
+DELTA_DELETED_FILES_NAME = "deleted_files.txt"
+
+# Seconds between progress updates in the window and on the console
+PROGRESS_INTERVAL = 0.2
+
+class ExportCancelled(Exception):
+    """Raised inside the export when the user cancelled it."""
+
+class ExportRefused(Exception):
+    """Raised when the destination can not be used, e.g. a non-empty output folder."""
+
 def load_config():
-    """Load the source path and output path from the settings.ini file."""
+    """Load the source path, output path, export target (folder, incremental or zip) and delta package option from the settings.ini file."""
     config = configparser.ConfigParser()
     
     # Set defaults
     source_path = ""
     output_path = os.path.join(os.getcwd(), "out")  # Default output path
+    export_target = "folder"
+    delta_package = False
     
     if os.path.exists(CONFIG_FILE):
         config.read(CONFIG_FILE)
@@ -37,11 +78,13 @@ def load_config():
         # Check if output_folder exists in the config
         if config.has_option('Paths', 'output_folder'):
             output_path = config.get('Paths', 'output_folder')
+        export_target = config.get('Export', 'target', fallback="folder").strip() or "folder"
+        delta_package = config.getboolean('Export', 'delta_package', fallback=False)
     
-    return source_path, output_path
+    return source_path, output_path, export_target, delta_package
 
-def save_config(source_path, output_path):
-    """Save the source path and output path to the settings.ini file."""
+def save_config(source_path, output_path, export_target="folder"):
+    """Save the source path, output path and export target to the settings.ini file."""
     config = configparser.ConfigParser()
     if not os.path.exists(CONFIG_FILE):
         config['Paths'] = {}
@@ -50,95 +93,457 @@ def save_config(source_path, output_path):
     config.read(CONFIG_FILE)
     config['Paths']['vcmi_mod_folder'] = source_path
     config['Paths']['output_folder'] = output_path  # Save the output folder path
+    if not config.has_section('Export'):
+        config['Export'] = {}
+    config['Export']['target'] = export_target
 
     with open(CONFIG_FILE, 'w') as configfile:
         config.write(configfile)
 
-def copy_files(src, dest):
-    """Copy files from source to destination while excluding certain files and folders."""
-    excluded_items = ["config", ".json", ".git", ".gitignore", "README.md", "LICENSE"]
+def iter_export_files(src):
+    """Yield (source path, path relative to src) of all files to export, excluding certain files and folders."""
     for root, dirs, files in os.walk(src):
         # Exclude specified items
-        files = [f for f in files if not any(f.lower() == item.lower() or f.lower().endswith(".json") for item in excluded_items)]
+        files = [f for f in files if not any(f.lower() == item.lower() or f.lower().endswith(".json") for item in EXCLUDED_ITEMS)]
         # Exclude specified folders
-        dirs[:] = [d for d in dirs if d not in excluded_items]
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_ITEMS]
 
         for file in files:
             src_path = os.path.join(root, file)
-            dest_path = os.path.join(dest, os.path.relpath(src_path, src))
+            yield src_path, os.path.relpath(src_path, src)
 
-            # Ensure destination folder exists
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+def collect_export_files(src):
+    """Return (source path, path relative to src, size) of all files to export, so totals are known up front."""
+    return [(src_path, relative_path, os.path.getsize(src_path)) for src_path, relative_path in iter_export_files(src)]
+
+def check_cancelled(cancel_event):
+    """Raise ExportCancelled if the cancel event (threading.Event) is set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled()
+
+def copy_files(src, dest, files=None, progress=None, cancel_event=None):
+    """Copy files from source to destination while excluding certain files and folders.
+
+    progress(files done, total files, bytes done, total bytes) is called after every file.
+    """
+    files = collect_export_files(src) if files is None else files
+    total_bytes = sum(size for _, _, size in files)
+    bytes_done = 0
+
+    for files_done, (src_path, relative_path, size) in enumerate(files, 1):
+        check_cancelled(cancel_event)
+        dest_path = os.path.join(dest, relative_path)
+
+        # Ensure destination folder exists
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+        shutil.copy2(src_path, dest_path)
+        bytes_done += size
+        if progress:
+            progress(files_done, len(files), bytes_done, total_bytes)
+
+def get_zip_path(src, dest):
+    """Return the archive written by the zip export: <output folder>/<mod folder name>.zip"""
+    return os.path.join(dest, os.path.basename(os.path.normpath(src)) + ".zip")
+
+def write_zip(files, zip_path, workers=ZIP_WORKERS, extra_entries=(), progress=None, cancel_event=None):
+    """Write (source path, relative path, size) files into a zip archive. Returns the number of written files.
+
+    Stored formats are streamed by the writing thread, all other files are deflated by `workers` threads
+    while earlier entries are written. Entries keep the order of `files`, followed by the (name, data) extra_entries.
+    """
+    os.makedirs(os.path.dirname(zip_path) or ".", exist_ok=True)
+    temp_zip_path = zip_path + ".tmp"
+    total_bytes = sum(size for _, _, size in files)
+    done = Counter()
 
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor, ZipStreamWriter(temp_zip_path) as zip_writer:
+            # (relative path, source path, future or None for stored files), bounded so memory stays flat
+            pending = deque()
+
+            def write_next_entry():
+                relative_path, src_path, future = pending.popleft()
+                if future is None:
+                    size = zip_writer.write_stored_file(relative_path, src_path)
+                else:
+                    compressed_data, crc, size = future.result()
+                    zip_writer.write_compressed(relative_path, compressed_data, crc, size, os.path.getmtime(src_path))
+                done["files"] += 1
+                done["bytes"] += size
+                if progress:
+                    progress(done["files"], len(files), done["bytes"], total_bytes)
+
+            for src_path, relative_path, _ in files:
+                check_cancelled(cancel_event)
+                if os.path.splitext(relative_path)[1].lower() in STORED_EXTENSIONS:
+                    pending.append((relative_path, src_path, None))
+                else:
+                    pending.append((relative_path, src_path, executor.submit(deflate_file, src_path)))
+
+                if len(pending) > workers * 4:
+                    write_next_entry()
+
+            while pending:
+                check_cancelled(cancel_event)
+                write_next_entry()
+
+            for name, data in extra_entries:
+                compressed_data, crc, size = deflate_data(data)
+                zip_writer.write_compressed(name, compressed_data, crc, size, time.time())
+    except BaseException:
+        # A cancelled or failed archive is not kept
+        if os.path.exists(temp_zip_path):
+            os.remove(temp_zip_path)
+        raise
+
+    # Only a complete archive replaces an earlier one
+    os.replace(temp_zip_path, zip_path)
+    return done["files"]
+
+def export_zip(src, zip_path, workers=ZIP_WORKERS, files=None, progress=None, cancel_event=None):
+    """Write the files to export directly into a zip archive. Returns the number of exported files."""
+    return write_zip(collect_export_files(src) if files is None else files, zip_path, workers,
+                     progress=progress, cancel_event=cancel_event)
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file."""
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(1024 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+def load_export_manifest(dest):
+    """Load the manifest of an earlier export into dest, None if there is no (readable) manifest."""
+    manifest_path = os.path.join(dest, EXPORT_MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != EXPORT_MANIFEST_VERSION or not isinstance(manifest.get("files"), dict):
+        return None
+    return manifest
+
+def save_export_manifest(dest, manifest):
+    """Write the manifest atomically, an interrupted export never leaves a half written manifest."""
+    manifest_path = os.path.join(dest, EXPORT_MANIFEST_NAME)
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def remove_exported_file(dest, relative_path):
+    """Remove a file of an earlier export and the folders it leaves empty."""
+    dest_path = os.path.join(dest, relative_path)
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    folder = os.path.dirname(dest_path)
+    while os.path.normpath(folder) != os.path.normpath(dest) and os.path.isdir(folder) and not os.listdir(folder):
+        os.rmdir(folder)
+        folder = os.path.dirname(folder)
+
+def export_incremental(src, dest, delta_zip_path=None, files=None, progress=None, cancel_event=None):
+    """Update an earlier folder export: copy only added or changed files and remove deleted ones.
+
+    The exported files are remembered in dest/export_manifest.json (path, size, mtime, SHA-256). Files with the
+    same size and mtime are not read at all, touched files with the same hash are not copied again.
+    With delta_zip_path, the added and changed files plus a deleted_files.txt are also written to that archive.
+    Returns a Counter with added, changed, removed and unchanged files.
+    """
+    files = collect_export_files(src) if files is None else files
+    total_bytes = sum(size for _, _, size in files)
+    bytes_done = 0
+    manifest = load_export_manifest(dest) or {"version": EXPORT_MANIFEST_VERSION, "files": {}}
+    previous_files = manifest["files"]
+    current_files = {}
+    changed_files = []
+    stats = Counter()
+
+    try:
+        for files_done, (src_path, relative_path, size) in enumerate(files, 1):
+            check_cancelled(cancel_event)
+            relative_path = relative_path.replace(os.sep, '/')
+            dest_path = os.path.join(dest, relative_path)
+            src_stat = os.stat(src_path)
+            record = previous_files.get(relative_path)
+            exported = record is not None and os.path.exists(dest_path)
+            bytes_done += size
+            if progress:
+                progress(files_done, len(files), bytes_done, total_bytes)
+
+            if exported and record["size"] == src_stat.st_size and record["mtime"] == src_stat.st_mtime:
+                current_files[relative_path] = record
+                stats["unchanged"] += 1
+                continue
+
+            sha256 = hash_file(src_path)
+            current_files[relative_path] = {"size": src_stat.st_size, "mtime": src_stat.st_mtime, "sha256": sha256}
+            if exported and record["size"] == src_stat.st_size and record["sha256"] == sha256:
+                stats["unchanged"] += 1
+                continue
+
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
             shutil.copy2(src_path, dest_path)
+            changed_files.append((src_path, relative_path, size))
+            stats["changed" if record is not None else "added"] += 1
+    except ExportCancelled:
+        # Files not visited yet keep their earlier records, so the next run continues where this one stopped
+        manifest["files"] = dict(previous_files, **current_files)
+        save_export_manifest(dest, manifest)
+        raise
+
+    removed_files = sorted(set(previous_files) - set(current_files))
+    for relative_path in removed_files:
+        remove_exported_file(dest, relative_path)
+        stats["removed"] += 1
+
+    manifest["files"] = current_files
+    save_export_manifest(dest, manifest)
+
+    if delta_zip_path and (changed_files or removed_files):
+        deleted_list = "".join(relative_path + "\n" for relative_path in removed_files).encode('utf-8')
+        write_zip(changed_files, delta_zip_path, extra_entries=[(DELTA_DELETED_FILES_NAME, deleted_list)] if removed_files else ())
+    return stats
+
+def get_delta_zip_path(src, dest):
+    """Return the delta package of an incremental export: <mod folder name>_delta_<date_time>.zip next to the output folder.
+
+    A package of an earlier export in the same second is never overwritten, a counter (_02, _03, ...) is added
+    instead, so the names still sort in export order.
+    """
+    base_path = os.path.join(os.path.dirname(os.path.normpath(dest)),
+                             f"{os.path.basename(os.path.normpath(src))}_delta_{time.strftime('%Y%m%d_%H%M%S')}")
+    delta_zip_path = base_path + ".zip"
+    counter = 1
+    while os.path.exists(delta_zip_path):
+        counter += 1
+        delta_zip_path = f"{base_path}_{counter:02d}.zip"
+    return delta_zip_path
+
+def run_export(source_path, output_path, export_target="folder", delta_package=False, progress=None, cancel_event=None):
+    """Run an export without any user interaction and return the completion message.
+
+    Raises ExportRefused if the destination can not be used and ExportCancelled if cancel_event was set.
+    Used by the background worker of the window and by the headless command line mode.
+    """
+    files = collect_export_files(source_path)
+
+    if export_target == "zip":
+        zip_path = get_zip_path(source_path, output_path)
+        exported = export_zip(source_path, zip_path, files=files, progress=progress, cancel_event=cancel_event)
+        return f"{exported} mod assets written to: {zip_path}"
+
+    if export_target == "incremental":
+        # Only an empty folder or the result of an earlier incremental export is updated
+        if os.path.exists(output_path) and os.listdir(output_path) and load_export_manifest(output_path) is None:
+            raise ExportRefused(f"The destination folder is not empty and has no {EXPORT_MANIFEST_NAME}: {output_path}. No files will be copied.")
+        delta_zip_path = get_delta_zip_path(source_path, output_path) if delta_package else None
+        stats = export_incremental(source_path, output_path, delta_zip_path, files, progress, cancel_event)
+        message = (f"Mod assets updated in: {output_path}\n"
+                   f"Added: {stats['added']}, changed: {stats['changed']}, removed: {stats['removed']}, unchanged: {stats['unchanged']}")
+        if delta_zip_path and os.path.exists(delta_zip_path):
+            message += f"\nDelta package: {delta_zip_path}"
+        return message
 
-def browse_source_path():
-    """Open a dialog to select the source directory."""
-    source_path = filedialog.askdirectory(initialdir=source_path_var.get())
-    if source_path:  # Only update if a valid directory is selected
-        source_path_var.set(source_path)
-        source_path_entry.delete(0, tk.END)
-        source_path_entry.insert(0, source_path)
-
-def browse_output_path():
-    """Open a dialog to select the output directory."""
-    output_path = filedialog.askdirectory(initialdir=output_path_var.get())
-    if output_path:  # Only update if a valid directory is selected
-        output_path_var.set(output_path)
-        output_path_entry.delete(0, tk.END)
-        output_path_entry.insert(0, output_path)
-
-def start_asset_extraction():
-    """Initiate the file copying process after checking if the destination folder is empty."""
-    source_path = source_path_var.get()
-    output_path = output_path_var.get()
-    
-    # Save the selected source path and output path to settings.ini
-    save_config(source_path, output_path)
-    
     # Check if the output folder is not empty
     if os.path.exists(output_path) and os.listdir(output_path):
-        messagebox.showwarning("Warning", f"The destination folder is not empty: {output_path}. No files will be copied.")
-        return  # Exit the function if the destination folder is not empty
-    
+        raise ExportRefused(f"The destination folder is not empty: {output_path}. No files will be copied.")
+
     # Proceed with the file copying if the output folder is empty
-    copy_files(source_path, output_path)
-    messagebox.showinfo("Extraction Complete", f"Mod assets copied successfully to: {output_path}")
+    copy_files(source_path, output_path, files, progress, cancel_event)
+    return f"Mod assets copied successfully to: {output_path}"
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+
+def format_progress(files_done, total_files, bytes_done, total_bytes, elapsed):
+    """Return a progress line with files and bytes done, throughput and estimated time left."""
+    throughput = bytes_done / elapsed if elapsed > 0 else 0
+    line = f"Files: {files_done}/{total_files}, {format_size(bytes_done)}/{format_size(total_bytes)}, {format_size(throughput)}/s"
+    if throughput > 0:
+        line += f", ETA {int((total_bytes - bytes_done) / throughput)} s"
+    return line
+
+def throttled_progress(report):
+    """Wrap report(files done, total files, bytes done, total bytes, elapsed) to be called at most every PROGRESS_INTERVAL seconds (and for the last file)."""
+    start_time = time.monotonic()
+    last_report = [0.0]
+
+    def progress(files_done, total_files, bytes_done, total_bytes):
+        now = time.monotonic()
+        if now - last_report[0] >= PROGRESS_INTERVAL or files_done == total_files:
+            last_report[0] = now
+            report(files_done, total_files, bytes_done, total_bytes, now - start_time)
+    return progress
+
+def create_window():
+    """Create the main window with the path inputs, the start and cancel buttons and the progress line."""
+    # Imported here, so the headless mode and the export functions work without tkinter
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+
+    window = tk.Tk()
+    window.title("VCMI Mod Assets Extraction")
+
+    # StringVars to store last selected paths
+    source_path_var = tk.StringVar()
+    output_path_var = tk.StringVar()
+    export_target_var = tk.StringVar()
+    status_var = tk.StringVar()
+
+    # Load last selected paths from the config file
+    last_source_path, last_output_path, last_export_target, delta_package = load_config()
+    source_path_var.set(last_source_path)
+    output_path_var.set(last_output_path)  # Set output path from config or default
+    export_target_var.set(last_export_target if last_export_target in EXPORT_TARGETS else "folder")
+
+    # The export runs on a worker thread, which only talks to the window through this queue
+    messages = queue.Queue()
+    cancel_event = threading.Event()
+
+    def browse_source_path():
+        """Open a dialog to select the source directory."""
+        source_path = filedialog.askdirectory(initialdir=source_path_var.get())
+        if source_path:  # Only update if a valid directory is selected
+            source_path_var.set(source_path)
+
+    def browse_output_path():
+        """Open a dialog to select the output directory."""
+        output_path = filedialog.askdirectory(initialdir=output_path_var.get())
+        if output_path:  # Only update if a valid directory is selected
+            output_path_var.set(output_path)
+
+    def export_worker(source_path, output_path, export_target):
+        progress = throttled_progress(lambda *values: messages.put(("progress", format_progress(*values))))
+        try:
+            messages.put(("done", run_export(source_path, output_path, export_target, delta_package, progress, cancel_event)))
+        except ExportCancelled:
+            messages.put(("cancelled", f"Export cancelled, output is incomplete: {output_path}"))
+        except ExportRefused as e:
+            messages.put(("refused", str(e)))
+        except Exception as e:
+            messages.put(("error", f"Export failed: {e}"))
+
+    def poll_messages():
+        """Show the messages of the worker, runs on the Tk main thread every 100 ms while exporting."""
+        while True:
+            try:
+                kind, text = messages.get_nowait()
+            except queue.Empty:
+                window.after(100, poll_messages)
+                return
+
+            if kind == "progress":
+                status_var.set(text)
+                continue
+
+            start_extraction_button.config(state=tk.NORMAL)
+            cancel_button.config(state=tk.DISABLED)
+            status_var.set(text.splitlines()[0])
+            if kind == "done":
+                messagebox.showinfo("Extraction Complete", text)
+            elif kind == "error":
+                messagebox.showerror("Error", text)
+            else:
+                messagebox.showwarning("Warning", text)
+            return
+
+    def start_asset_extraction():
+        """Save the settings and start the export on a worker thread."""
+        source_path = source_path_var.get()
+        output_path = output_path_var.get()
+        export_target = export_target_var.get()
+
+        # Save the selected source path, output path and export target to settings.ini
+        save_config(source_path, output_path, export_target)
+
+        if export_target == "zip":
+            zip_path = get_zip_path(source_path, output_path)
+            if os.path.exists(zip_path) and not messagebox.askyesno("Warning", f"The archive already exists: {zip_path}. Replace it?"):
+                return
+
+        cancel_event.clear()
+        start_extraction_button.config(state=tk.DISABLED)
+        cancel_button.config(state=tk.NORMAL)
+        status_var.set("Collecting files...")
+        threading.Thread(target=export_worker, args=(source_path, output_path, export_target), daemon=True).start()
+        window.after(100, poll_messages)
+
+    def cancel_asset_extraction():
+        cancel_event.set()
+        status_var.set("Cancelling...")
+
+    # Create and place widgets
+    source_path_label = tk.Label(window, text="VCMI mod folder:")
+    source_path_label.grid(row=0, column=0, padx=5, pady=5)
+
+    source_path_entry = tk.Entry(window, width=50, textvariable=source_path_var)
+    source_path_entry.grid(row=0, column=1, padx=5, pady=5)
+
+    browse_source_button = tk.Button(window, text="Browse", command=browse_source_path)
+    browse_source_button.grid(row=0, column=2, padx=5, pady=5)
+
+    output_path_label = tk.Label(window, text="Output Folder:")
+    output_path_label.grid(row=1, column=0, padx=5, pady=5)
+
+    output_path_entry = tk.Entry(window, width=50, textvariable=output_path_var)
+    output_path_entry.grid(row=1, column=1, padx=5, pady=5)
 
-# Create the main window
-window = tk.Tk()
-window.title("VCMI Mod Assets Extraction")
+    browse_output_button = tk.Button(window, text="Browse", command=browse_output_path)
+    browse_output_button.grid(row=1, column=2, padx=5, pady=5)
 
-# StringVars to store last selected paths
-source_path_var = tk.StringVar()
-output_path_var = tk.StringVar()
+    export_target_frame = tk.Frame(window)
+    export_target_frame.grid(row=2, column=1, pady=5)
+    tk.Radiobutton(export_target_frame, text="Folder", variable=export_target_var, value="folder").pack(side=tk.LEFT)
+    tk.Radiobutton(export_target_frame, text="Update folder", variable=export_target_var, value="incremental").pack(side=tk.LEFT)
+    tk.Radiobutton(export_target_frame, text="Zip archive", variable=export_target_var, value="zip").pack(side=tk.LEFT)
 
-# Load last selected paths from the config file
-last_source_path, last_output_path = load_config()
-source_path_var.set(last_source_path)
-output_path_var.set(last_output_path)  # Set output path from config or default
+    button_frame = tk.Frame(window)
+    button_frame.grid(row=3, column=1, pady=10)
+    start_extraction_button = tk.Button(button_frame, text="Start extraction", command=start_asset_extraction)
+    start_extraction_button.pack(side=tk.LEFT, padx=5)
+    cancel_button = tk.Button(button_frame, text="Cancel", command=cancel_asset_extraction, state=tk.DISABLED)
+    cancel_button.pack(side=tk.LEFT, padx=5)
 
-# Create and place widgets
-source_path_label = tk.Label(window, text="VCMI mod folder:")
-source_path_label.grid(row=0, column=0, padx=5, pady=5)
+    status_label = tk.Label(window, textvariable=status_var, anchor="w")
+    status_label.grid(row=4, column=0, columnspan=3, sticky="we", padx=5, pady=5)
 
-source_path_entry = tk.Entry(window, width=50, textvariable=source_path_var)
-source_path_entry.grid(row=0, column=1, padx=5, pady=5)
+    return window
 
-browse_source_button = tk.Button(window, text="Browse", command=browse_source_path)
-browse_source_button.grid(row=0, column=2, padx=5, pady=5)
+def run_headless(args):
+    """Run the export from the command line, paths and target default to settings.ini."""
+    source_path, output_path, export_target, delta_package = load_config()
+    source_path = args.source_folder or source_path
+    output_path = args.output_folder or output_path
+    export_target = args.target or export_target
+    delta_package = args.delta_package or delta_package
 
-output_path_label = tk.Label(window, text="Output Folder:")
-output_path_label.grid(row=1, column=0, padx=5, pady=5)
+    progress = throttled_progress(lambda *values: print(format_progress(*values)))
+    try:
+        print(run_export(source_path, output_path, export_target, delta_package, progress))
+    except (ExportRefused, ExportCancelled) as e:
+        print(e)
+        return 1
+    return 0
 
-output_path_entry = tk.Entry(window, width=50, textvariable=output_path_var)
-output_path_entry.grid(row=1, column=1, padx=5, pady=5)
+def main():
+    parser = argparse.ArgumentParser(description="Export the assets of a VCMI mod. Opens the window unless --headless is given.")
+    parser.add_argument('--headless', action='store_true', help="Export without window, paths default to settings.ini.")
+    parser.add_argument('--source_folder', type=str, default=None, help="VCMI mod folder (headless only).")
+    parser.add_argument('--output_folder', type=str, default=None, help="Output folder (headless only).")
+    parser.add_argument('--target', type=str, choices=EXPORT_TARGETS, default=None, help="Export target (headless only).")
+    parser.add_argument('--delta_package', action='store_true', help="Write a delta package in incremental mode (headless only).")
+    args = parser.parse_args()
 
-browse_output_button = tk.Button(window, text="Browse", command=browse_output_path)
-browse_output_button.grid(row=1, column=2, padx=5, pady=5)
+    if args.headless:
+        sys.exit(run_headless(args))
 
-start_extraction_button = tk.Button(window, text="Start extraction", command=start_asset_extraction)
-start_extraction_button.grid(row=2, column=1, pady=10)
+    # Create the main window and start the main loop
+    create_window().mainloop()
 
-# Start the main loop
-window.mainloop()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Zip Stream Writer
+
+Minimal zip archive writer used by the exporter to write assets directly into a zip file.
+
+Unlike `zipfile`, entries can be added as data already deflated elsewhere (e.g. on worker threads), and stored
+entries are streamed from their source file in chunks. ZIP64 records are written only when sizes, offsets or the
+number of entries need them, so small archives stay readable by every zip tool (and VCMI).
+"""
+
+import os
+import time
+import zlib
+import struct
+
+STORED = 0
+DEFLATED = 8
+
+# Chunk size when streaming stored files into the archive
+COPY_CHUNK_SIZE = 1024 * 1024
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# General purpose flag: file names are UTF-8
+UTF8_FLAG = 0x800
+
+
+def deflate_data(data):
+    """Deflate data for a zip entry. Returns (compressed data, crc32, uncompressed size)."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+
+def deflate_file(source_path):
+    """Read and deflate a file. Returns (compressed data, crc32, uncompressed size). Thread safe."""
+    with open(source_path, 'rb') as source_file:
+        return deflate_data(source_file.read())
+
+
+def _dos_date_time(mtime):
+    # Zip dates start in 1980
+    year, month, day, hour, minute, second = time.localtime(max(mtime, 315532800))[:6]
+    return ((year - 1980) << 9) | (month << 5) | day, (hour << 11) | (minute << 5) | (second // 2)
+
+
+class ZipStreamWriter:
+    """Write a zip archive entry by entry. Use as a context manager or call close()."""
+
+    def __init__(self, zip_path):
+        self.zip_file = open(zip_path, 'wb')
+        self.central_directory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_local_header(self, name, method, crc, compressed_size, size, mtime):
+        """Write the local file header and return its offset."""
+        offset = self.zip_file.tell()
+        encoded_name = name.replace(os.sep, '/').encode('utf-8')
+        date, dos_time = _dos_date_time(mtime)
+
+        extra = b''
+        if size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT:
+            extra = struct.pack('<HHQQ', 0x0001, 16, size, compressed_size)
+            size = compressed_size = ZIP64_LIMIT
+
+        version = 45 if extra else 20
+        self.zip_file.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, version, UTF8_FLAG, method, dos_time, date,
+                                        crc, compressed_size, size, len(encoded_name), len(extra)))
+        self.zip_file.write(encoded_name + extra)
+        self.central_directory.append([encoded_name, method, dos_time, date, crc, 0, 0, offset])
+        return offset
+
+    def _finish_entry(self, crc, compressed_size, size):
+        entry = self.central_directory[-1]
+        entry[4:7] = [crc, compressed_size, size]
+
+    def write_compressed(self, name, compressed_data, crc, size, mtime, method=DEFLATED):
+        """Add an entry from data already compressed with `method` (raw deflate for DEFLATED)."""
+        self._write_local_header(name, method, crc, len(compressed_data), size, mtime)
+        self.zip_file.write(compressed_data)
+        self._finish_entry(crc, len(compressed_data), size)
+
+    def write_stored_file(self, name, source_path):
+        """Add a file without compression, streaming it from disk. Returns the number of bytes written."""
+        source_stat = os.stat(source_path)
+        offset = self._write_local_header(name, STORED, 0, source_stat.st_size, source_stat.st_size, source_stat.st_mtime)
+
+        crc = 0
+        size = 0
+        with open(source_path, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(COPY_CHUNK_SIZE), b''):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                self.zip_file.write(chunk)
+
+        if size != source_stat.st_size:
+            raise OSError(f"File changed while writing it to the archive: {source_path}")
+
+        # The crc is only known now, patch it into the local header
+        end = self.zip_file.tell()
+        self.zip_file.seek(offset + 14)
+        self.zip_file.write(struct.pack('<I', crc))
+        self.zip_file.seek(end)
+        self._finish_entry(crc, size, size)
+        return size
+
+    def close(self):
+        """Write the central directory and close the archive."""
+        if self.zip_file.closed:
+            return
+        central_directory_offset = self.zip_file.tell()
+
+        for encoded_name, method, dos_time, date, crc, compressed_size, size, offset in self.central_directory:
+            # Only the values that do not fit are moved to the zip64 extra field, in this order
+            zip64_values = [value for value in (size, compressed_size, offset) if value >= ZIP64_LIMIT]
+            extra = struct.pack('<HH', 0x0001, 8 * len(zip64_values)) + struct.pack(f'<{len(zip64_values)}Q', *zip64_values) if zip64_values else b''
+            version = 45 if zip64_values else 20
+            self.zip_file.write(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, UTF8_FLAG, method,
+                                            dos_time, date, crc, min(compressed_size, ZIP64_LIMIT), min(size, ZIP64_LIMIT),
+                                            len(encoded_name), len(extra), 0, 0, 0, 0, min(offset, ZIP64_LIMIT)))
+            self.zip_file.write(encoded_name + extra)
+
+        central_directory_end = self.zip_file.tell()
+        central_directory_size = central_directory_end - central_directory_offset
+        entry_count = len(self.central_directory)
+
+        if entry_count >= ZIP64_COUNT_LIMIT or central_directory_offset >= ZIP64_LIMIT or central_directory_size >= ZIP64_LIMIT:
+            self.zip_file.write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, entry_count, entry_count,
+                                            central_directory_size, central_directory_offset))
+            self.zip_file.write(struct.pack('<IIQI', 0x07064b50, 0, central_directory_end, 1))
+
+        self.zip_file.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(entry_count, ZIP64_COUNT_LIMIT),
+                                        min(entry_count, ZIP64_COUNT_LIMIT), min(central_directory_size, ZIP64_LIMIT),
+                                        min(central_directory_offset, ZIP64_LIMIT), 0))
+        self.zip_file.close()
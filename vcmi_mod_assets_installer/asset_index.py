@@ -0,0 +1,108 @@
+"""
+Asset Index
+
+Case-insensitive index of the extracted assets (out/mod_data), built with a single directory scan.
+
+JSON files reference assets in any casing (`AvWattak.def`) while the archives decide the casing of the extracted
+files (`AVWATTAK.DEF`). Windows does not care, but on case-sensitive file systems a plain path join misses such
+files. The index maps every case-folded file name to the real file (path and stat), so the copy step resolves
+each asset with one dictionary lookup instead of a stat call, on every file system.
+
+Names that exist more than once, differing only in case (possible on case-sensitive file systems, e.g. leftovers
+of an older extraction), are ambiguous: an exact-case match wins, otherwise the first name in sorted order is used.
+They are listed by print_collisions() and written to a report with write_collision_report().
+"""
+
+import os
+import argparse
+from collections import namedtuple
+
+IndexedAsset = namedtuple('IndexedAsset', ['name', 'path', 'stat'])
+
+# folder: indexed folder, assets: {case-folded name: [IndexedAsset, ...] sorted by name}
+AssetIndex = namedtuple('AssetIndex', ['folder', 'assets'])
+
+
+def build_asset_index(folder):
+    """Scan the folder once (not recursive) and return its AssetIndex. A missing folder gives an empty index."""
+    assets = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    assets.setdefault(entry.name.casefold(), []).append(IndexedAsset(entry.name, entry.path, entry.stat()))
+    except FileNotFoundError:
+        pass
+
+    for candidates in assets.values():
+        if len(candidates) > 1:
+            candidates.sort(key=lambda asset: asset.name)
+    return AssetIndex(folder, assets)
+
+
+def resolve_asset(index, file_name):
+    """Return the IndexedAsset for a file name (case-insensitive, exact case preferred), or None if missing."""
+    candidates = index.assets.get(file_name.casefold())
+    if not candidates:
+        return None
+    if len(candidates) > 1:
+        for candidate in candidates:
+            if candidate.name == file_name:
+                return candidate
+    return candidates[0]
+
+
+def resolve_asset_path(index, source_path):
+    """Return the IndexedAsset for a path inside the indexed folder, or None if missing.
+
+    Paths outside the indexed folder (or in its sub folders) are not in the index and are checked with os.stat.
+    """
+    folder, file_name = os.path.split(source_path)
+    if os.path.normcase(os.path.normpath(folder)) == os.path.normcase(os.path.normpath(index.folder)):
+        return resolve_asset(index, file_name)
+    try:
+        return IndexedAsset(os.path.basename(source_path), source_path, os.stat(source_path))
+    except OSError:
+        return None
+
+
+def find_collisions(index):
+    """Return the lists of file names differing only in case, sorted."""
+    return sorted([asset.name for asset in candidates] for candidates in index.assets.values() if len(candidates) > 1)
+
+
+def print_collisions(index):
+    """Print the ambiguous file names of the index. Returns their number."""
+    collisions = find_collisions(index)
+    if collisions:
+        print(f"Warning: {len(collisions)} asset names in {index.folder} differ only in case:")
+        for names in collisions:
+            print(f"  {', '.join(names)} (used: {names[0]}, unless a file name matches exactly)")
+    return len(collisions)
+
+
+def write_collision_report(index, report_path):
+    """Write the ambiguous file names, one group per line. Returns their number."""
+    collisions = find_collisions(index)
+    with open(report_path, 'w', encoding='utf-8') as report_file:
+        report_file.write(f"Asset names in {index.folder} differing only in case:\n")
+        for names in collisions:
+            report_file.write(', '.join(names) + '\n')
+    return len(collisions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index an extracted assets folder and report names differing only in case.")
+    parser.add_argument('folder', help="Folder with the extracted assets (out/mod_data).")
+    parser.add_argument('--report_file', type=str, default=None, help="Also write the collisions to this file.")
+    parser.add_argument('--resolve', type=str, nargs='*', default=[], help="File names to resolve.")
+    args = parser.parse_args()
+
+    asset_index = build_asset_index(args.folder)
+    print(f"Indexed {sum(len(candidates) for candidates in asset_index.assets.values())} files in: {args.folder}")
+    print_collisions(asset_index)
+    if args.report_file:
+        write_collision_report(asset_index, args.report_file)
+    for name in args.resolve:
+        resolved = resolve_asset(asset_index, name)
+        print(f"{name} -> {resolved.path if resolved else 'not found'}")
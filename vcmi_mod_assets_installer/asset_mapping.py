@@ -0,0 +1,261 @@
+"""
+Asset Mapping
+
+One reader / writer for the asset mapping text format used by the installer and the tools, and an indexed
+SQLite store of the mapping for lookups without re-parsing the text files.
+
+Text format (assets_to_paths_mapping_raw.txt, assets_to_paths_mapping.txt, overridden_assets.txt):
+    // Source file: Mods\\sw\\Content\\config\\objects.json
+    "sprites/ADVMWIND.def" : "ADVMWIND.def",
+
+The left side is the asset path from the JSON file (raw mapping) or the destination relative to the VCMI mod
+folder (final mapping, overridden_assets.txt). It may contain colons (e.g. Windows drive letters).
+
+Store (out/assets_mapping.sqlite): one row per AssetRecord plus the mod folder (path up to Content) of its
+source file. File name, mod and destination are indexed and compared case-insensitively.
+
+Usage:
+python asset_mapping.py <store_file> --import_file assets_to_paths_mapping.txt
+python asset_mapping.py <store_file> --export_file assets_to_paths_mapping.txt
+python asset_mapping.py <store_file> --file_name ADVMWIND.def
+python asset_mapping.py <store_file> --mod "Mods\\sw" / --destination "Mods\\sw\\Content\\Sprites\\ADVMWIND.def"
+"""
+
+import os
+import re
+import sqlite3
+import argparse
+from asset_records import AssetRecord
+
+SOURCE_FILE_COMMENT = "// Source file:"
+
+# The file name never contains quotes, so everything up to the last '" : "' is the path
+MAPPING_LINE_PATTERN = re.compile(r'^"(.*)"\s*:\s*"([^"]*)",?$')
+
+CONTENT_FOLDER_PATTERN = re.compile(r'^(.*?)[\\/]?Content(?:[\\/]|$)')
+
+# Bump this whenever the table layout changes, older stores are then rebuilt
+MAPPING_STORE_VERSION = 1
+
+# Rows are inserted in batches of this size
+STORE_BATCH_SIZE = 5000
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY,
+    source_file TEXT,
+    mod TEXT COLLATE NOCASE,
+    asset_path TEXT,
+    file_name TEXT COLLATE NOCASE,
+    destination TEXT COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS assets_file_name ON assets (file_name);
+CREATE INDEX IF NOT EXISTS assets_mod ON assets (mod);
+CREATE INDEX IF NOT EXISTS assets_destination ON assets (destination);
+"""
+
+
+def parse_mapping_line(line):
+    """Return (path, file name) of a mapping line, or None for comments, empty and invalid lines."""
+    match = MAPPING_LINE_PATTERN.match(line.strip())
+    if match:
+        return match.group(1), match.group(2)
+    return None
+
+
+def to_native_path(path):
+    """Return a mapping path (written with \\ or / separators) with the path separators of this system."""
+    return path.replace('\\', os.sep).replace('/', os.sep)
+
+
+def format_mapping_line(path, file_name):
+    return f'"{path}" : "{file_name}",\n'
+
+
+def iter_mapping_file(mapping_file_path, report_invalid=True):
+    """Yield (source file or None, path, file name) for every entry of a mapping text file."""
+    source_file = None
+    with open(mapping_file_path, 'r') as mapping_file:
+        for line in mapping_file:
+            line = line.strip()
+            if line.startswith(SOURCE_FILE_COMMENT):
+                source_file = line[len(SOURCE_FILE_COMMENT):].strip()
+                continue
+            # Ignore other comment lines
+            if line.startswith("//") or not line:
+                continue
+
+            entry = parse_mapping_line(line)
+            if entry is None:
+                if report_invalid:
+                    print(f"Invalid line format in {mapping_file_path}: {line}")
+                continue
+            yield (source_file,) + entry
+
+
+def iter_mapping_records(mapping_file_path, final=True):
+    """Yield the entries of a mapping text file as AssetRecords.
+
+    The path is the destination for a final mapping (assets_to_paths_mapping.txt) and the asset path otherwise.
+    """
+    for source_file, path, file_name in iter_mapping_file(mapping_file_path):
+        if final:
+            yield AssetRecord(source_file, None, file_name, path)
+        else:
+            yield AssetRecord(source_file, path, file_name, None)
+
+
+def get_mod_folder(source_file):
+    """Return the mod folder of a source file (path up to its Content folder, original case), or None."""
+    match = CONTENT_FOLDER_PATTERN.match(source_file or "")
+    return match.group(1) if match else None
+
+
+def open_mapping_store(store_path):
+    """Open (and create if needed) a mapping store. Stores of another version are recreated empty."""
+    connection = sqlite3.connect(store_path)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != MAPPING_STORE_VERSION:
+        connection.execute("DROP TABLE IF EXISTS assets")
+        connection.execute(f"PRAGMA user_version = {MAPPING_STORE_VERSION}")
+    connection.executescript(STORE_SCHEMA)
+    return connection
+
+
+def _insert_records(connection, records):
+    connection.executemany(
+        "INSERT INTO assets (source_file, mod, asset_path, file_name, destination) VALUES (?, ?, ?, ?, ?)", records)
+
+
+def store_mapping_records(records, store_path):
+    """Pass the records through while replacing the content of the store with them.
+
+    The store is only updated once all records went through, an interrupted run keeps the previous mapping.
+    """
+    connection = open_mapping_store(store_path)
+    try:
+        connection.execute("DELETE FROM assets")
+        mod = None
+        current_source_file = None
+        batch = []
+        for record in records:
+            if record.source_file != current_source_file:
+                current_source_file = record.source_file
+                # Files outside of a Content folder belong to the mod of the previous source file
+                mod = get_mod_folder(record.source_file) or mod
+            batch.append((record.source_file, mod, record.asset_path, record.file_name, record.destination))
+            if len(batch) >= STORE_BATCH_SIZE:
+                _insert_records(connection, batch)
+                batch = []
+            yield record
+
+        _insert_records(connection, batch)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def import_mapping_file(store_path, mapping_file_path, final=True):
+    """Replace the content of the store with a mapping text file. Returns the number of imported entries."""
+    return sum(1 for _ in store_mapping_records(iter_mapping_records(mapping_file_path, final), store_path))
+
+
+def _query_records(store_path, where, parameter):
+    connection = open_mapping_store(store_path)
+    try:
+        rows = connection.execute(
+            f"SELECT source_file, asset_path, file_name, destination FROM assets WHERE {where} ORDER BY id", (parameter,))
+        return [AssetRecord(*row) for row in rows]
+    finally:
+        connection.close()
+
+
+def iter_store_records(store_path):
+    """Yield all AssetRecords of the store in mapping order, reading the rows one by one."""
+    connection = open_mapping_store(store_path)
+    try:
+        for row in connection.execute("SELECT source_file, asset_path, file_name, destination FROM assets ORDER BY id"):
+            yield AssetRecord(*row)
+    finally:
+        connection.close()
+
+
+def read_store_file_names(store_path):
+    """Return the (lower case) file names referenced in the store."""
+    connection = open_mapping_store(store_path)
+    try:
+        return {row[0].lower() for row in connection.execute("SELECT DISTINCT file_name FROM assets")}
+    finally:
+        connection.close()
+
+
+def find_by_file_name(store_path, file_name):
+    """Return the AssetRecords referencing a file name (case-insensitive)."""
+    return _query_records(store_path, "file_name = ?", file_name)
+
+
+def find_by_mod(store_path, mod):
+    """Return the AssetRecords of a mod folder, e.g. "Mods\\sw" (case-insensitive)."""
+    return _query_records(store_path, "mod = ?", mod)
+
+
+def find_by_destination(store_path, destination):
+    """Return the AssetRecords installed to a destination relative to the VCMI mod folder (case-insensitive)."""
+    return _query_records(store_path, "destination = ?", destination)
+
+
+def find_mods_referencing(store_path, file_name):
+    """Return the sorted mod folders referencing a file name, e.g. which mods use ADVMWIND.def."""
+    connection = open_mapping_store(store_path)
+    try:
+        rows = connection.execute("SELECT DISTINCT mod FROM assets WHERE file_name = ? AND mod IS NOT NULL ORDER BY mod",
+                                  (file_name,))
+        return [row[0] for row in rows]
+    finally:
+        connection.close()
+
+
+def export_mapping_file(store_path, output_file_path, final=True):
+    """Write the store as a mapping text file (destinations for a final mapping, asset paths otherwise)."""
+    connection = open_mapping_store(store_path)
+    try:
+        current_source_file = None
+        with open(output_file_path, 'w') as output_file:
+            for source_file, asset_path, file_name, destination in connection.execute(
+                    "SELECT source_file, asset_path, file_name, destination FROM assets ORDER BY id"):
+                if source_file != current_source_file and source_file is not None:
+                    output_file.write(f'{SOURCE_FILE_COMMENT} {source_file}\n')
+                current_source_file = source_file
+                output_file.write(format_mapping_line(destination if final else asset_path, file_name))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import, export and query the asset mapping store.")
+    parser.add_argument('store_file', help="Path to the mapping store, e.g. out/assets_mapping.sqlite")
+    parser.add_argument('--import_file', type=str, default=None, help="Mapping text file to import (replaces the store content).")
+    parser.add_argument('--export_file', type=str, default=None, help="Mapping text file to write from the store.")
+    parser.add_argument('--raw', action='store_true', help="Imported / exported file is a raw mapping (asset paths, not destinations).")
+    parser.add_argument('--file_name', type=str, default=None, help="List the entries and mods referencing a file name.")
+    parser.add_argument('--mod', type=str, default=None, help="List the entries of a mod folder.")
+    parser.add_argument('--destination', type=str, default=None, help="List the entries installed to a destination.")
+
+    args = parser.parse_args()
+
+    if args.import_file:
+        imported = import_mapping_file(args.store_file, args.import_file, not args.raw)
+        print(f"Imported {imported} entries from: {args.import_file}")
+    if args.export_file:
+        export_mapping_file(args.store_file, args.export_file, not args.raw)
+        print(f"Exported mapping to: {args.export_file}")
+
+    found_records = []
+    if args.file_name:
+        found_records += find_by_file_name(args.store_file, args.file_name)
+        print(f"Mods referencing {args.file_name}: {', '.join(find_mods_referencing(args.store_file, args.file_name)) or 'none'}")
+    if args.mod:
+        found_records += find_by_mod(args.store_file, args.mod)
+    if args.destination:
+        found_records += find_by_destination(args.store_file, args.destination)
+    for found_record in found_records:
+        print(f"{found_record.source_file}: {format_mapping_line(found_record.destination or found_record.asset_path, found_record.file_name).strip()}")
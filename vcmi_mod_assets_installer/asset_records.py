@@ -0,0 +1,16 @@
+"""
+Asset Records
+
+Typed records passed between the installer stages when running as an in-memory pipeline:
+scan JSON files (step 4) -> calculate actual paths (step 5) -> copy assets (step 6).
+
+AssetRecord fields:
+- source_file: JSON file the asset is referenced from, relative to the VCMI mod folder
+- asset_path: asset path as written in the JSON file (extension normalized), e.g. "sprites/ADVMWIND.def"
+- file_name: file name of the asset in the extracted mod data, e.g. "ADVMWIND.def"
+- destination: path relative to the VCMI mod folder the asset is copied to, None until step 5 has run
+"""
+
+from collections import namedtuple
+
+AssetRecord = namedtuple('AssetRecord', ['source_file', 'asset_path', 'file_name', 'destination'])
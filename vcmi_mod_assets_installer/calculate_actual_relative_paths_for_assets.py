@@ -1,64 +1,96 @@
 import re
 import os
 import argparse
+from asset_mapping import SOURCE_FILE_COMMENT, parse_mapping_line, format_mapping_line, to_native_path
+
+def get_relative_root(source_file):
+    """Return the mod root ("<path up to and including Content>", original case) of a source file, or None."""
+    # Extract the relative root up to 'Content', the case is kept so the existing mod folders are used on every OS
+    match = re.search(r'^(.*?Content)', source_file)
+    if match:
+        return to_native_path(match.group(0))
+    return None
+
+
+def calculate_actual_path(relative_root, path, definition):
+    """Return the destination path of an asset, based on the mod root and the asset extension."""
+    # Determine the extension type
+    ext = os.path.splitext(definition)[1].lower()
+    # Create the output directory based on the extension
+    if ext == '.def':
+        output_directory = "Sprites"
+    elif ext == '.wav':
+        output_directory = "Sounds"
+    elif ext == '.mp3':
+        output_directory = "Music"
+    elif ext == '.bik':
+        output_directory = "Video"
+    elif ext == '.png':
+        output_directory = "Data"
+    else:
+        output_directory = ""  # Handle unknown extensions
+
+    # Create the new relative path with the path separators of this system
+    return os.path.join(relative_root, output_directory, to_native_path(path))
+
+
+def iter_actual_paths(records):
+    """Set the destination of every AssetRecord coming from the JSON scan."""
+    relative_root = ""
+    current_source_file = None
+
+    for record in records:
+        if record.source_file != current_source_file:
+            current_source_file = record.source_file
+            # Files outside of a Content folder keep the root of the previous source file
+            relative_root = get_relative_root(record.source_file) or relative_root
+
+        yield record._replace(destination=calculate_actual_path(relative_root, record.asset_path, record.file_name))
+
+
+def write_mapping_file(records, output_file_path):
+    """Pass the records through while writing them to output_file_path in the assets_to_paths_mapping.txt format."""
+    current_source_file = None
+    with open(output_file_path, 'w') as output_file:
+        for record in records:
+            if record.source_file != current_source_file:
+                current_source_file = record.source_file
+                output_file.write(f'{SOURCE_FILE_COMMENT} {record.source_file}\n')
+            output_file.write(format_mapping_line(record.destination, record.file_name))
+            yield record
+
 
 def calculate_actual_paths_for_assets(input_file_path, output_file_path):
-    # Initialize the relative root and a list to hold all lines
+    # Initialize the relative root
     relative_root = ""
-    output_lines = []
 
-    with open(input_file_path, 'r') as file:
+    # Lines are written while reading, so memory use does not grow with the mapping size
+    with open(input_file_path, 'r') as file, open(output_file_path, 'w') as output_file:
         for line in file:
             line = line.strip()
             # Check for source file comment
-            if line.startswith("// Source file:"):
-                # Extract the relative root before 'Content'
-                match = re.search(r'^(.*?Content)', line)  # Changed 'config' to 'Content'
-                if match:
-                    # Remove the prefix '// Source file: ' and construct relative_root
-                    relative_root = match.group(0).replace("// Source file: ", "").replace("Content", "").lower() + "content\\"
+            if line.startswith(SOURCE_FILE_COMMENT):
+                # Remove the prefix '// Source file: ' and construct relative_root
+                relative_root = get_relative_root(line[len(SOURCE_FILE_COMMENT):].strip()) or relative_root
                 # Add the comment line to output (but do not process it)
-                output_lines.append(line)  # Retain the comment line in the output
+                output_file.write(line + '\n')  # Retain the comment line in the output
                 continue
             
             # Skip comments that start with // and empty lines
             if line.startswith("//") or not line:
-                output_lines.append(line)  # Keep comments in the output
+                output_file.write(line + '\n')  # Keep comments in the output
                 continue
             
-            # Use regex to find the path and definition
-            match = re.match(r'"([^"]+)"\s*:\s*"([^"]+)"', line)
-            if match:
-                path, definition = match.groups()
-                # Determine the extension type
-                ext = os.path.splitext(definition)[1].lower()
-                # Create the output directory based on the extension
-                if ext == '.def':
-                    output_directory = "Sprites"
-                elif ext == '.wav':
-                    output_directory = "Sounds"
-                elif ext == '.mp3':
-                    output_directory = "Music"
-                elif ext == '.bik':
-                    output_directory = "Video"
-                elif ext == '.png':
-                    output_directory = "Data"
-                else:
-                    output_directory = ""  # Handle unknown extensions
-
-                # Create the new relative path using backslashes
-                new_path = relative_root + output_directory + "\\" + path.replace('/', '\\')
+            # Find the path and definition
+            entry = parse_mapping_line(line)
+            if entry:
+                path, definition = entry
+                new_path = calculate_actual_path(relative_root, path, definition)
                 # Replace the path in the output line
-                new_line = f'"{new_path}" : "{definition}",'
-                output_lines.append(new_line)  # Add the valid entry to the output
+                output_file.write(format_mapping_line(new_path, definition))  # Add the valid entry to the output
             else:
                 # If the line doesn't match, keep it unchanged
-                output_lines.append(line)
-
-    # Write the modified lines to the output file
-    with open(output_file_path, 'w') as output_file:
-        for output_line in output_lines:
-            output_file.write(output_line + '\n')
+                output_file.write(line + '\n')
 
 
 if __name__ == "__main__":
@@ -1,86 +1,256 @@
 import os
-import shutil
 import argparse
+import itertools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from file_transfer import transfer_file, TRANSFER_MODES
+from extraction_cache import hash_file
+from asset_mapping import iter_mapping_file, to_native_path
+from asset_index import build_asset_index, resolve_asset_path, print_collisions
 
+COMPARE_MODES = ('mtime', 'hash', 'none')
 
-def copy_mod_assets(assets_to_path_mapping_file_path, source_folder, destination_folder):
-    # Read the input file and process each line
-    with open(assets_to_path_mapping_file_path, 'r') as input_file:
-        for line in input_file:
-            line = line.strip()
-            # Ignore comment lines
-            if line.startswith("//") or not line:
+# Print a progress line every this many copied files
+COPY_PROGRESS_INTERVAL = 1000
+
+# Default number of copy threads ([Install] workers, --workers)
+COPY_WORKERS = 4
+
+
+def iter_record_pairs(records, source_folder, destination_folder):
+    """Yield (source path, destination path) for AssetRecords with calculated destination."""
+    for record in records:
+        yield os.path.join(source_folder, record.file_name), os.path.join(destination_folder, record.destination)
+
+
+def iter_mapping_file_pairs(mapping_file_path, source_folder, destination_folder):
+    """Yield (source path, destination path) for the lines of a mapping / overridden_assets file."""
+    for _, relative_path, file_name in iter_mapping_file(mapping_file_path):
+        # Construct the full source file path and the full destination path (mapping files may come from Windows)
+        yield os.path.join(source_folder, file_name), os.path.join(destination_folder, to_native_path(relative_path))
+
+
+def find_overridden_assets_files(destination_folder, excluded_folders=()):
+    """Return the paths of all overridden_assets.txt files in the destination folder and its subfolders (sorted).
+
+    The files live next to the Content folder of each mod (see tools/create_overridden_assets_files.py), so Content
+    folders (the installed assets) and hidden folders are never entered, nor are excluded_folders (e.g. the
+    installer's out folder, which may live inside the VCMI mod).
+    """
+    overridden_assets_files = []
+    if not destination_folder or not os.path.isdir(destination_folder):
+        return overridden_assets_files
+    excluded_keys = {os.path.normcase(os.path.abspath(folder)) for folder in excluded_folders}
+
+    folders = [destination_folder]
+    while folders:
+        folder = folders.pop()
+        try:
+            with os.scandir(folder) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+
+        sub_folders = []
+        for entry in entries:
+            if entry.is_dir():
+                if (entry.name.lower() != "content" and not entry.name.startswith('.')
+                        and os.path.normcase(os.path.abspath(entry.path)) not in excluded_keys):
+                    sub_folders.append(entry.path)
+            elif entry.name == "overridden_assets.txt":
+                overridden_assets_files.append(entry.path)
+        # Reverse sorted on the stack, so folders are visited in sorted order
+        folders.extend(sorted(sub_folders, reverse=True))
+    return overridden_assets_files
+
+
+def iter_overridden_pairs(destination_folder, source_folder, excluded_folders=()):
+    """Yield (source path, destination path) for all overridden_assets.txt files in the destination folder."""
+    for overridden_assets_file in find_overridden_assets_files(destination_folder, excluded_folders):
+        yield from iter_mapping_file_pairs(overridden_assets_file, source_folder, destination_folder)
+
+
+def is_up_to_date(source_path, source_stat, dest_path, compare):
+    """Check if dest_path already holds the content of source_path.
+
+    compare: 'mtime' (same size and destination not older), 'hash' (same size and SHA-256) or 'none' (always copy).
+    """
+    if compare == 'none':
+        return False
+    try:
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+
+    if dest_stat.st_size != source_stat.st_size:
+        return False
+    if (dest_stat.st_dev, dest_stat.st_ino) == (source_stat.st_dev, source_stat.st_ino):
+        return True  # Hard link to the source
+    if compare == 'hash':
+        return hash_file(source_path) == hash_file(dest_path)
+    return dest_stat.st_mtime >= source_stat.st_mtime
+
+
+def plan_copies(pairs, compare='mtime', source_index=None):
+    """Turn (source path, destination path) pairs into the list of copies really needed.
+
+    Destinations are deduplicated (the last pair wins, as with copying one after another), missing sources are
+    reported and destinations which are already up to date are skipped. Returns (copy plan, stats Counter).
+    With a source_index (see asset_index.py) sources are resolved case-insensitively without a stat call each.
+    """
+    if compare not in COMPARE_MODES:
+        raise ValueError(f"Unknown compare mode: {compare} (expected one of {', '.join(COMPARE_MODES)})")
+    sources_by_destination = {}
+    stats = Counter()
+    for source_path, dest_path in pairs:
+        stats["referenced"] += 1
+        # VCMI looks up files case-insensitively, so destinations differing only in case are the same asset
+        dest_key = os.path.normpath(dest_path).casefold()
+        if dest_key in sources_by_destination:
+            stats["duplicates"] += 1
+            del sources_by_destination[dest_key]  # Keep the order of the last occurrence
+        sources_by_destination[dest_key] = (source_path, dest_path)
+
+    copy_plan = []
+    for source_path, dest_path in sources_by_destination.values():
+        if source_index is not None:
+            source = resolve_asset_path(source_index, source_path)
+            if source is None:
+                stats["missing"] += 1
+                print(f"File not found: {source_path}")
                 continue
-            
-            # Split the line into source and destination
-            parts = line.split(":")
-            if len(parts) != 2:
-                print(f"Invalid line format: {line}")
+            if source.name != os.path.basename(source_path):
+                stats["resolved_other_case"] += 1
+            source_path, source_stat = source.path, source.stat
+        else:
+            try:
+                source_stat = os.stat(source_path)
+            except OSError:
+                stats["missing"] += 1
+                print(f"File not found: {source_path}")
                 continue
 
-            # Extract source file and destination path
-            source_file = parts[0].strip().strip('"')  # Remove quotes
-            dest_file_name = parts[1].strip().strip('",')  # Remove quotes and trailing commas
-            
-            # Construct the full source file path
-            full_source_path = os.path.join(source_folder, dest_file_name)
-            # Construct the full destination path
-            dest_path = os.path.join(destination_folder, source_file)
-            
-            # Create the destination directory if it does not exist
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-            # Copy the file if it exists in the source folder
-            if os.path.exists(full_source_path):
-                shutil.copy(full_source_path, dest_path)  # Copy the file
-                print(f"Copied: {full_source_path} -> {dest_path}")
-            else:
-                print(f"File not found: {full_source_path}")
-
-
-def copy_overridden_assets(destination_folder, source_folder):
-    # Walk through the destination folder recursively
-    for root, dirs, files in os.walk(destination_folder):
-        for file in files:
-            if file == "overridden_assets.txt":
-                overridden_assets_path = os.path.join(root, file)
-                with open(overridden_assets_path, 'r') as overridden_file:
-                    for line in overridden_file:
-                        line = line.strip()
-                        # Ignore comment lines
-                        if line.startswith("//") or not line:
-                            continue
-                        
-                        # Split the line into relative path and file name
-                        parts = line.split(":")
-                        if len(parts) != 2:
-                            print(f"Invalid line format in {overridden_assets_path}: {line}")
-                            continue
-
-                        # Extract relative path and file name
-                        relative_path = parts[0].strip().strip('"')  # Remove quotes
-                        file_name = parts[1].strip().strip('",')  # Remove quotes and trailing commas
-                        
-                        # Construct the full source file path
-                        full_source_path = os.path.join(source_folder, file_name)
-                        # Construct the full destination path
-                        dest_path = os.path.join(destination_folder, relative_path)
-
-                        # Create the destination directory if it does not exist
-                        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-                        # Copy the file if it exists in the source folder
-                        if os.path.exists(full_source_path):
-                            shutil.copy(full_source_path, dest_path)  # Copy the file
-                            print(f"Copied: {full_source_path} -> {dest_path}")
-                        else:
-                            print(f"File not found: {full_source_path}")
-
-
-def copy_assets(assets_to_path_mapping_file_path, source_folder, destination_folder):
-    # Call the individual copy functions
-    copy_mod_assets(assets_to_path_mapping_file_path, source_folder, destination_folder)
-    copy_overridden_assets(destination_folder, source_folder)
+        if is_up_to_date(source_path, source_stat, dest_path, compare):
+            stats["up_to_date"] += 1
+            stats["up_to_date_bytes"] += source_stat.st_size
+        else:
+            stats["planned"] += 1
+            stats["planned_bytes"] += source_stat.st_size
+            copy_plan.append((source_path, dest_path, source_stat.st_size))
+    return copy_plan, stats
+
+
+def _transfer_planned_file(source_path, dest_path, transfer_mode):
+    """Transfer one planned file. Returns (transfer mode used, error message or None). Runs in copy threads."""
+    try:
+        return transfer_file(source_path, dest_path, transfer_mode), None
+    except OSError as e:
+        return None, f"Failed to copy {source_path} -> {dest_path}: {e}"
+
+
+def execute_copy_plan(copy_plan, stats, transfer_mode='copy', workers=1):
+    """Copy the planned files. transfer_mode: see file_transfer.py.
+
+    All destination directories are created up front, then the files are transferred by up to `workers` threads.
+    Instead of a line per file, progress is printed every COPY_PROGRESS_INTERVAL files; failures are always printed.
+    """
+    # Checked here, an unknown mode would otherwise raise in every copy thread
+    if transfer_mode not in TRANSFER_MODES:
+        raise ValueError(f"Unknown transfer mode: {transfer_mode} (expected one of {', '.join(TRANSFER_MODES)})")
+    # Create every destination directory once
+    for directory in sorted({os.path.dirname(dest_path) for _, dest_path, _ in copy_plan}):
+        os.makedirs(directory, exist_ok=True)
+
+    if workers > 1 and len(copy_plan) > 1:
+        print(f"Copying {len(copy_plan)} files with {workers} threads")
+        executor = ThreadPoolExecutor(max_workers=workers)
+        results = executor.map(_transfer_planned_file, [source for source, _, _ in copy_plan],
+                               [dest for _, dest, _ in copy_plan], itertools.repeat(transfer_mode))
+    else:
+        executor = None
+        results = (_transfer_planned_file(source, dest, transfer_mode) for source, dest, _ in copy_plan)
+
+    try:
+        for (source_path, dest_path, size), (used_mode, error) in zip(copy_plan, results):
+            if error:
+                print(error)
+                stats["failed"] += 1
+                continue
+            stats["copied"] += 1
+            stats["copied_bytes"] += size
+            stats["copied_by_" + used_mode] += 1
+            if stats["copied"] % COPY_PROGRESS_INTERVAL == 0:
+                print(f"Copied {stats['copied']} of {len(copy_plan)} files")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def print_copy_summary(stats):
+    print(f"Assets referenced: {stats['referenced']} ({stats['duplicates']} duplicates, {stats['missing']} not found)")
+    if stats["resolved_other_case"]:
+        print(f"Found with other case: {stats['resolved_other_case']} files")
+    print(f"Up to date, skipped: {stats['up_to_date']} files ({stats['up_to_date_bytes']} bytes)")
+    transfer_counts = ", ".join(f"{mode}: {stats['copied_by_' + mode]}" for mode in TRANSFER_MODES if stats['copied_by_' + mode])
+    print(f"Copied: {stats['copied']} of {stats['planned']} planned files ({stats['copied_bytes']} of {stats['planned_bytes']} bytes)"
+          + (f" ({transfer_counts})" if transfer_counts else ""))
+    if stats["failed"]:
+        print(f"Failed: {stats['failed']} files")
+
+
+def copy_asset_pairs(pairs, transfer_mode='copy', compare='mtime', workers=1, source_index=None):
+    """Plan and execute the copies for (source path, destination path) pairs. Returns the stats Counter.
+
+    source_index: AssetIndex of the source folder, built with build_asset_index() after the extraction.
+    """
+    copy_plan, stats = plan_copies(pairs, compare, source_index)
+    if source_index is not None:
+        stats["ambiguous_names"] = print_collisions(source_index)
+    execute_copy_plan(copy_plan, stats, transfer_mode, workers)
+    print_copy_summary(stats)
+    return stats
+
+
+def copy_asset_records(records, source_folder, destination_folder, transfer_mode='copy', compare='mtime', workers=1):
+    """Copy the assets of AssetRecords (with calculated destination) from the source folder to the destination folder."""
+    return copy_asset_pairs(iter_record_pairs(records, source_folder, destination_folder), transfer_mode, compare, workers,
+                            build_asset_index(source_folder))
+
+
+def copy_mod_assets(assets_to_path_mapping_file_path, source_folder, destination_folder, transfer_mode='copy', compare='mtime', workers=1):
+    return copy_asset_pairs(iter_mapping_file_pairs(assets_to_path_mapping_file_path, source_folder, destination_folder),
+                            transfer_mode, compare, workers, build_asset_index(source_folder))
+
+
+def copy_overridden_assets(destination_folder, source_folder, transfer_mode='copy', compare='mtime', workers=1):
+    return copy_asset_pairs(iter_overridden_pairs(destination_folder, source_folder), transfer_mode, compare, workers,
+                            build_asset_index(source_folder))
+
+
+def read_mapped_file_names(mapping_file_path):
+    """Return the (lower case) file names listed on the right side of a mapping / overridden_assets file."""
+    return {file_name.lower() for _, _, file_name in iter_mapping_file(mapping_file_path, report_invalid=False)}
+
+
+def find_overridden_asset_names(destination_folder, excluded_folders=()):
+    """Return the (lower case) file names listed in all overridden_assets.txt files of the destination folder."""
+    overridden_names = set()
+    for overridden_assets_file in find_overridden_assets_files(destination_folder, excluded_folders):
+        overridden_names |= read_mapped_file_names(overridden_assets_file)
+    return overridden_names
+
+
+def collect_required_asset_names(assets_to_path_mapping_file_path, destination_folder=None, excluded_folders=()):
+    """Collect the names of all assets the copy step will need: the mapping plus all overridden_assets.txt files."""
+    return read_mapped_file_names(assets_to_path_mapping_file_path) | find_overridden_asset_names(destination_folder, excluded_folders)
+
+
+def copy_assets(assets_to_path_mapping_file_path, source_folder, destination_folder, transfer_mode='copy', compare='mtime', workers=1,
+                excluded_folders=()):
+    # Mapping and overridden assets are planned together, overridden assets come last and win for the same destination
+    pairs = itertools.chain(iter_mapping_file_pairs(assets_to_path_mapping_file_path, source_folder, destination_folder),
+                            iter_overridden_pairs(destination_folder, source_folder, excluded_folders))
+    return copy_asset_pairs(pairs, transfer_mode, compare, workers, build_asset_index(source_folder))
 
 
 # Example usage
@@ -97,9 +267,14 @@ if __name__ == "__main__":
     parser.add_argument('--destination_folder', type=str, 
                         default=r"d:\git\succession_wars_overridden_assets_tests",
                         help='Path to your destination folder')
+    parser.add_argument('--transfer', type=str, choices=TRANSFER_MODES, default='copy',
+                        help='How files are transferred: copy, hardlink, reflink or kernel (copy_file_range)')
+    parser.add_argument('--compare', type=str, choices=COMPARE_MODES, default='mtime',
+                        help='How installed files are checked to be up to date: mtime (size and mtime), hash or none (always copy)')
+    parser.add_argument('--workers', type=int, default=COPY_WORKERS, help='Number of threads copying files in parallel')
     
     # Parse the command-line arguments
     args = parser.parse_args()
     
     # Call the wrapper function to copy assets
-    copy_assets(args.assets_to_path_mapping_file_path, args.source_folder, args.destination_folder)
+    copy_assets(args.assets_to_path_mapping_file_path, args.source_folder, args.destination_folder, args.transfer, args.compare, args.workers)
@@ -1,5 +1,9 @@
 import os
-import json5  # json5 allows comments in JSON
+import re
+import json
+import mmap
+import hashlib
+import json5  # json5 allows comments in JSON, used only when the fast stdlib parser fails
 
 # json5 may or may not expose a JSON5DecodeError class depending on version.
 # Fall back to ValueError so decode errors are caught correctly.
@@ -8,94 +12,339 @@ try:
 except AttributeError:
     JSON5DecodeError = ValueError
 import argparse
-import re
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, namedtuple
+from asset_records import AssetRecord
+from asset_mapping import SOURCE_FILE_COMMENT, format_mapping_line
+from extraction_cache import hash_file
+
+# Comments and trailing commas, matched together with strings so that "//" or "," inside strings is kept
+JSON_COMMENT_PATTERN = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.DOTALL)
+JSON_TRAILING_COMMA_PATTERN = re.compile(r'("(?:\\.|[^"\\])*")|,(?=\s*[}\]])')
+
+# Names of the parsing paths reported in the scan summary
+PARSER_JSON = "json"
+PARSER_JSON_WITHOUT_COMMENTS = "json (comments stripped)"
+PARSER_JSON5 = "json5"
+PARSER_FAILED = "decode error"
+PARSER_CACHED = "unchanged"
+PARSER_SKIPPED = "skipped (no asset values)"
+
+# Strings ending with these extensions mark a file as containing assets (even without a '/')
+FOUND_VALUE_EXTENSIONS = (".def", ".png", ".bik", ".smk", ".mp3", ".wav")
+
+# Byte patterns of the prefilter: a file containing none of them has no valid values and is not parsed
+PREFILTER_PATTERNS = (b'/', b'\\u') + tuple(extension.encode() for extension in FOUND_VALUE_EXTENSIONS)
+
+# Files from this size on are memory-mapped for the prefilter
+PREFILTER_MMAP_SIZE = 1024 * 1024
+
+# Asset paths with other extensions (or none) get ".def" appended
+ASSET_EXTENSIONS = {".def", ".wav", ".mp3", ".bmp", ".png", ".bik"}
+
+# Bump this whenever the asset references found in a JSON file may change, so old manifests are not reused
+SCAN_MANIFEST_VERSION = 2
 
+ScanResult = namedtuple('ScanResult', ['references', 'error', 'parser', 'sha256'])
 
-def process_json_files(folder_path, output_file):
+
+def iter_json_files(folder_path, excluded_paths=()):
+    """Yield the paths of all .json files in the folder and subfolders, except mod.json files.
+
+    Folders and files are visited in sorted order, so the scan output does not depend on the file system.
+    excluded_paths are skipped: folders (e.g. the installer's out folder, which may live inside the VCMI mod) are
+    not entered and files are not yielded, so the scan manifest, extraction cache and run report are never scanned
+    as mod files.
+    """
+    excluded_keys = {os.path.normcase(os.path.abspath(path)) for path in excluded_paths}
     # Use os.walk to iterate over all files in the folder and subfolders
-    for dirpath, _, filenames in os.walk(folder_path):
-        for filename in filenames:
+    for dirpath, dirnames, filenames in os.walk(folder_path):
+        if excluded_keys:
+            dirnames[:] = [dirname for dirname in dirnames
+                           if os.path.normcase(os.path.abspath(os.path.join(dirpath, dirname))) not in excluded_keys]
+        dirnames.sort()
+        for filename in sorted(filenames):
             # Skip files named mod.json
             if filename == "mod.json":
                 continue
-            
+
             if filename.endswith(".json"):
                 file_path = os.path.join(dirpath, filename)
-                # Open the file with UTF-8 encoding
-                with open(file_path, 'r', encoding='utf-8') as json_file:
-                    try:
-                        # Use json5 to load the JSON file with support for comments
-                        data = json5.load(json_file)
-                        
-                        # Check for valid values before writing the source file message
-                        found_values = check_for_valid_values(data)
-
-                        # Write the source file comment only if valid values were found
-                        if found_values:
-                            relative_path = os.path.relpath(file_path, folder_path)
-                            with open(output_file, 'a', encoding='utf-8') as out_file:
-                                out_file.write(f'// Source file: {relative_path}\n')
-
-                            # Process the JSON data after writing the comment
-                            process_json(data, output_file)
-
-                    except JSON5DecodeError:
-                        # Print only the simple file name for JSON decode errors (concise output)
-                        print(os.path.basename(file_path))
-                        continue
-                    except UnicodeDecodeError as e:
-                        print(f"Unicode decoding error in file {file_path}: {e}")
-
-
-def check_for_valid_values(data):
-    # Function to check if there are valid values in the JSON data
-    valid_extensions = {".def", ".png", ".bik", ".smk", ".mp3", ".wav"}
-    
-    if isinstance(data, dict):
-        return any(check_for_valid_values(value) for value in data.values())
-    elif isinstance(data, list):
-        return any(check_for_valid_values(item) for item in data)
-    else:
-        # Check if data is a string containing '/' or ends with one of the valid extensions
-        return isinstance(data, str) and ('/' in data or any(data.endswith(ext) for ext in valid_extensions))
-
-
-def process_json(data, output_file, parent_key=""):
-    # Recursive function to traverse the JSON structure and write valid values to the output file
-    if isinstance(data, dict):
-        for key, value in data.items():
-            process_json(value, output_file, parent_key + key + ".")
-    elif isinstance(data, list):
-        for idx, item in enumerate(data):
-            process_json(item, output_file, parent_key + str(idx) + ".")
+                if not excluded_keys or os.path.normcase(os.path.abspath(file_path)) not in excluded_keys:
+                    yield file_path
+
+
+def strip_json_comments(text):
+    """Remove // and /* */ comments and trailing commas outside of strings."""
+    text = JSON_COMMENT_PATTERN.sub(lambda match: match.group(1) or '', text)
+    return JSON_TRAILING_COMMA_PATTERN.sub(lambda match: match.group(1) or '', text)
+
+
+def load_json_text(text):
+    """Parse JSON text with the fastest parser that accepts it. Returns (data, parser name).
+
+    Plain JSON goes through the C accelerated stdlib parser, JSON with comments or trailing commas through the
+    stdlib parser after stripping them. Only real JSON5 (unquoted keys, single quotes, ...) needs json5.
+    """
+    try:
+        return json.loads(text), PARSER_JSON
+    except ValueError:
+        pass
+
+    try:
+        return json.loads(strip_json_comments(text)), PARSER_JSON_WITHOUT_COMMENTS
+    except ValueError:
+        pass
+
+    return json5.loads(text), PARSER_JSON5
+
+
+def has_possible_asset_values(content):
+    """Cheap check on the raw bytes (or mmap) of a JSON file: can it contain any valid value at all?
+
+    Escaped strings (\\uXXXX) could hide a '/' or an extension, so they always count as a hit.
+    """
+    return any(content.find(pattern) != -1 for pattern in PREFILTER_PATTERNS)
+
+
+def scan_json_file(file_path):
+    """Parse one JSON file and return a ScanResult.
+
+    Asset references are a list of (asset_path, file_name), or None if the file contains no valid values at all
+    (no source file comment is written for it) or could not be parsed. Files without any '/' or asset extension
+    in their raw bytes are not parsed at all. Runs in worker processes in parallel mode.
+    """
+    with open(file_path, 'rb') as json_file:
+        if os.fstat(json_file.fileno()).st_size >= PREFILTER_MMAP_SIZE:
+            # Large files are checked without reading them into memory first
+            with mmap.mmap(json_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                if not has_possible_asset_values(mapped_file):
+                    return ScanResult(None, None, PARSER_SKIPPED, hashlib.sha256(mapped_file).hexdigest())
+                content = mapped_file[:]
+        else:
+            content = json_file.read()
+            if not has_possible_asset_values(content):
+                return ScanResult(None, None, PARSER_SKIPPED, hashlib.sha256(content).hexdigest())
+    content_hash = hashlib.sha256(content).hexdigest()
+
+    try:
+        # Decode with UTF-8 encoding
+        data, parser_name = load_json_text(content.decode('utf-8'))
+
+        found_values, references = find_asset_references(data)
+
+        # Only files with valid values get a source file comment
+        if not found_values:
+            return ScanResult(None, None, parser_name, content_hash)
+
+        return ScanResult(references, None, parser_name, content_hash)
+
+    except JSON5DecodeError:
+        # Print only the simple file name for JSON decode errors (concise output)
+        return ScanResult(None, os.path.basename(file_path), PARSER_FAILED, content_hash)
+    except UnicodeDecodeError as e:
+        return ScanResult(None, f"Unicode decoding error in file {file_path}: {e}", PARSER_FAILED, content_hash)
+
+
+def load_scan_manifest(manifest_path, folder_path):
+    """Load the scan manifest of the folder, returning an empty one if it is missing, outdated or for another folder."""
+    empty_manifest = {"version": SCAN_MANIFEST_VERSION, "folder": os.path.abspath(folder_path), "files": {}}
+    if not os.path.exists(manifest_path):
+        return empty_manifest
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable scan manifest {manifest_path}: {e}")
+        return empty_manifest
+
+    if manifest.get("version") != SCAN_MANIFEST_VERSION or manifest.get("folder") != empty_manifest["folder"]:
+        return empty_manifest
+    return manifest
+
+
+def save_scan_manifest(manifest_path, manifest):
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(temp_path, manifest_path)
+
+
+def _get_cached_result(manifest_record, file_path, file_stat):
+    """Return the ScanResult stored in the manifest if the file did not change, else None."""
+    if not manifest_record or manifest_record["size"] != file_stat.st_size:
+        return None
+
+    if manifest_record["mtime"] != file_stat.st_mtime:
+        # Touched, but maybe not changed: compare the content
+        if manifest_record["sha256"] != hash_file(file_path):
+            return None
+        manifest_record["mtime"] = file_stat.st_mtime
+
+    references = manifest_record["references"]
+    if references is not None:
+        references = [tuple(reference) for reference in references]
+    return ScanResult(references, manifest_record["error"], PARSER_CACHED, manifest_record["sha256"])
+
+
+def iter_source_files(folder_path, workers=1, stats=None, manifest=None, excluded_paths=()):
+    """Yield (relative path, asset references) for every JSON file with valid values.
+
+    With workers > 1 the files are parsed by a process pool. Results are still yielded in the order of
+    iter_json_files, so the output is identical to the serial scan.
+    If a stats Counter is given, the number of files per parser is counted in it.
+    If a manifest (see load_scan_manifest) is given, only new or changed files are parsed. Once all files
+    were yielded the manifest holds the results of the current files (deleted files are dropped).
+    """
+    previous_files = manifest["files"] if manifest is not None else {}
+    current_files = {}
+
+    def iter_scan_jobs():
+        # (file path, relative path, stat, cached ScanResult) - stat and cached result only with a manifest
+        for file_path in iter_json_files(folder_path, excluded_paths):
+            relative_path = os.path.relpath(file_path, folder_path)
+            if manifest is None:
+                yield file_path, relative_path, None, None
+            else:
+                file_stat = os.stat(file_path)
+                yield file_path, relative_path, file_stat, _get_cached_result(previous_files.get(relative_path), file_path, file_stat)
+
+    if workers > 1:
+        scan_jobs = list(iter_scan_jobs())
+        files_to_scan = [job[0] for job in scan_jobs if job[3] is None]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Bigger chunks keep the inter-process overhead low for the many small JSON files
+            chunk_size = max(1, len(files_to_scan) // (workers * 4))
+            scanned = executor.map(scan_json_file, files_to_scan, chunksize=chunk_size)
+            yield from _iter_scan_results(((job, job[3] or next(scanned)) for job in scan_jobs), stats, current_files)
     else:
-        # Only process string values that contain '/' and do not contain unwanted patterns
-        if isinstance(data, str) and '/' in data and not is_unwanted_line(data):
-            node_value = data
-            # Check if node_value already has an extension
-            base_name, extension = os.path.splitext(node_value)
+        yield from _iter_scan_results(((job, job[3] or scan_json_file(job[0])) for job in iter_scan_jobs()), stats, current_files)
+
+    if manifest is not None:
+        manifest["files"] = current_files
+
+
+def _iter_scan_results(scan_results, stats, current_files):
+    for (file_path, relative_path, file_stat, _), result in scan_results:
+        if stats is not None:
+            stats[result.parser] += 1
+        if result.error:
+            print(result.error)
+
+        if file_stat is not None:
+            current_files[relative_path] = {"size": file_stat.st_size, "mtime": file_stat.st_mtime, "sha256": result.sha256,
+                                            "references": result.references, "error": result.error}
+
+        if result.references is not None:
+            yield relative_path, result.references
+
+
+def iter_asset_records(folder_path, raw_output_file=None, workers=1, stats=None, manifest=None, excluded_paths=()):
+    """Yield an AssetRecord for every asset referenced by the JSON files of the folder.
+
+    If raw_output_file is given, the records are also appended to it in the raw mapping text format.
+    Files and folders in excluded_paths are not scanned (see iter_json_files).
+    """
+    out_file = open(raw_output_file, 'a', encoding='utf-8') if raw_output_file else None
+    try:
+        for relative_path, references in iter_source_files(folder_path, workers, stats, manifest, excluded_paths):
+            if out_file:
+                out_file.write(f'{SOURCE_FILE_COMMENT} {relative_path}\n')
+
+            for asset_path, file_name in references:
+                if out_file:
+                    # Write to the output file in the format "<node_value>" : "<file_name>",
+                    out_file.write(format_mapping_line(asset_path, file_name))
+                yield AssetRecord(relative_path, asset_path, file_name, None)
+    finally:
+        if out_file:
+            out_file.close()
+
+
+def process_json_files(folder_path, output_file, workers=1, manifest_path=None, excluded_paths=()):
+    """Append the raw asset mapping of all JSON files in the folder to output_file.
+
+    With a manifest_path only new or changed JSON files are parsed, all others come from the manifest.
+    output_file, manifest_path and the excluded_paths (files or folders) are not scanned.
+    Returns the Counter of scanned files per parser.
+    """
+    stats = Counter()
+    manifest = load_scan_manifest(manifest_path, folder_path) if manifest_path else None
+    # The script's own files must not be scanned as mod files, also when they are written inside the VCMI mod
+    excluded_paths = list(excluded_paths) + [output_file] + ([manifest_path] if manifest_path else [])
+    for _ in iter_asset_records(folder_path, output_file, workers, stats, manifest, excluded_paths):
+        pass
+    if manifest is not None:
+        save_scan_manifest(manifest_path, manifest)
+    print_scan_summary(stats)
+    return stats
+
+
+def print_scan_summary(stats):
+    """Print how many JSON files were parsed by each parser (and how many were skipped or unchanged)."""
+    summary = ", ".join(f"{parser_name}: {count}" for parser_name, count in sorted(stats.items()))
+    print(f"Scanned {sum(stats.values())} JSON files ({summary})")
+
+
+def get_scan_counters(stats):
+    """Summarize the parser Counter of a scan for the run report."""
+    parsed = stats[PARSER_JSON] + stats[PARSER_JSON_WITHOUT_COMMENTS] + stats[PARSER_JSON5]
+    return {"files_scanned": sum(stats.values()), "files_parsed": parsed, "files_skipped": stats[PARSER_SKIPPED],
+            "files_unchanged": stats[PARSER_CACHED], "files_failed": stats[PARSER_FAILED], "parsers": dict(stats)}
+
+
+def find_asset_references(data):
+    """Walk the parsed JSON once and return (found_values, asset references).
+
+    found_values tells if any string contains '/' or ends with one of the asset extensions (the source file
+    comment is only written for such files). Asset references are (node_value, file_name) tuples of all strings
+    containing '/', in document order. Uses an explicit stack, so deeply nested configs need no recursion.
+    """
+    found_values = False
+    references = []
+    stack = [data]
+
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            # Reversed, so children are popped (and references found) in document order
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, str):
+            if '/' in node:
+                found_values = True
+                # Only process string values that do not contain unwanted patterns
+                if not is_unwanted_line(node):
+                    references.append(normalize_asset_reference(node))
+            elif not found_values and node.endswith(FOUND_VALUE_EXTENSIONS):
+                found_values = True
+
+    return found_values, references
+
 
-            # Define a set of valid extensions
-            valid_extensions = {".def", ".wav", ".mp3", ".bmp", ".png", ".bik"}
+def normalize_asset_reference(node_value):
+    """Normalize the extension of an asset path from a JSON file and return (node_value, file_name)."""
+    # Check if node_value already has an extension
+    base_name, extension = os.path.splitext(node_value)
 
-            # Check if the extension is empty or not in the valid extensions
-            if not extension or extension.lower() not in valid_extensions:
-                node_value += ".def"
+    # Check if the extension is empty or not in the valid extensions
+    if not extension or extension.lower() not in ASSET_EXTENSIONS:
+        node_value += ".def"
 
-            # Replace .bmp with .png
-            if '.bmp' in node_value:
-                node_value = node_value.split('.bmp')[0] + '.png'
+    # Replace .bmp with .png
+    if '.bmp' in node_value:
+        node_value = node_value.split('.bmp')[0] + '.png'
 
-            # If node_value contains ".def:", remove ":" and everything after it
-            if '.def:' in node_value:
-                node_value = node_value.split('.def:')[0] + '.def'
+    # If node_value contains ".def:", remove ":" and everything after it
+    if '.def:' in node_value:
+        node_value = node_value.split('.def:')[0] + '.def'
 
-            # Extract file name from the relative path
-            file_name = os.path.basename(node_value)
+    # Extract file name from the relative path
+    file_name = os.path.basename(node_value)
 
-            # Write to the output file in the format "<node_value>" : "<file_name>",
-            with open(output_file, 'a', encoding='utf-8') as out_file:
-                out_file.write(f'"{node_value}" : "{file_name}",\n')
+    return node_value, file_name
 
 
 def is_unwanted_line(line):
@@ -110,6 +359,10 @@ def main():
                         help="Path to the folder containing JSON files.")
     parser.add_argument('--output', type=str, default=r"c:/Users/Krs/Documents/My Games/vcmi/Mods/succession_wars/VCMI_SW_mod_Installer/out/assets_to_paths_mapping_raw_2.txt",
                         help="Path to the output file.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes parsing JSON files in parallel.")
+    parser.add_argument('--manifest', type=str, default=None,
+                        help="Scan manifest file. Only JSON files changed since the last run are parsed.")
 
     args = parser.parse_args()
 
@@ -121,7 +374,7 @@ def main():
         out_file.write("")  # Clear the file
 
     if os.path.exists(folder_path) and os.path.isdir(folder_path):
-        process_json_files(folder_path, output_file)
+        process_json_files(folder_path, output_file, args.workers, args.manifest)
     else:
         print(f"The folder path '{folder_path}' is not valid.")
 
@@ -0,0 +1,76 @@
+"""
+Extraction Cache
+
+Remembers which files were extracted from which H3 archive, so unchanged archives are not extracted again.
+
+Every archive is identified by its size, modification time and SHA-256 content hash, together with the
+extractor version (`h3_archive_reader.EXTRACTOR_VERSION`). The hash is only recalculated when size or
+modification time changed, so an unchanged archive costs a single `stat` call.
+
+Cache file format (JSON, stored as out/extraction_cache.json):
+{
+    "extractor_version": 1,
+    "archives": {
+        "<absolute archive path>": {"size": 123, "mtime": 1700000000.0, "sha256": "...", "extracted": ["advmwind.def", ...]}
+    }
+}
+"""
+
+import os
+import json
+import hashlib
+from h3_archive_reader import EXTRACTOR_VERSION
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file."""
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(HASH_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def load_cache(cache_path):
+    """Load the cache, returning an empty one if it is missing, broken or written by another extractor version."""
+    empty_cache = {"extractor_version": EXTRACTOR_VERSION, "archives": {}}
+    if not cache_path or not os.path.exists(cache_path):
+        return empty_cache
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable extraction cache {cache_path}: {e}")
+        return empty_cache
+
+    if cache.get("extractor_version") != EXTRACTOR_VERSION or not isinstance(cache.get("archives"), dict):
+        return empty_cache
+    return cache
+
+
+def save_cache(cache_path, cache):
+    """Write the cache atomically (a crash while writing never leaves a half written cache file)."""
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as cache_file:
+        json.dump(cache, cache_file, indent=1)
+    os.replace(temp_path, cache_path)
+
+
+def archive_fingerprint(archive_path, cached_record=None):
+    """Return {size, mtime, sha256} of an archive, reusing the cached hash if size and mtime did not change."""
+    stat = os.stat(archive_path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    if cached_record and cached_record.get("size") == stat.st_size and cached_record.get("mtime") == stat.st_mtime:
+        fingerprint["sha256"] = cached_record.get("sha256")
+    else:
+        fingerprint["sha256"] = hash_file(archive_path)
+    return fingerprint
+
+
+def is_same_archive(cached_record, fingerprint):
+    """Check if the cached record describes the same archive content (a touched but unchanged archive still matches)."""
+    return bool(cached_record) and cached_record.get("size") == fingerprint["size"] and cached_record.get("sha256") == fingerprint["sha256"]
@@ -0,0 +1,150 @@
+"""
+File Transfer
+
+Transfers a file from the extracted mod data to the VCMI mod with one of several strategies:
+- `copy`: Regular byte for byte copy (`shutil.copy`, default).
+- `hardlink`: Hard link to the extracted file. Instant and uses no extra disk space, only works on the same volume.
+  Note: the installed file and the file in out/mod_data are then the same file.
+- `reflink`: Copy-on-write clone (Linux FICLONE on btrfs, XFS, ...). Instant, independent files, same volume only.
+- `kernel`: In-kernel copy with `os.copy_file_range` (or `os.sendfile`), no data passes through Python.
+
+A strategy that is not supported (other volume, other file system, other OS) falls back automatically:
+hardlink -> copy, reflink -> kernel -> copy, kernel -> copy. Once a strategy failed for a pair of devices it is
+not tried again for that pair.
+
+An existing destination is never written in place: the new file is written next to it and replaces it atomically.
+With `hardlink` the installed file and the file in out/mod_data share their content, writing into one of them
+would change (or truncate) the other.
+"""
+
+import os
+import errno
+import shutil
+
+TRANSFER_MODES = ('copy', 'hardlink', 'reflink', 'kernel')
+
+FALLBACK_MODES = {
+    'hardlink': 'copy',
+    'reflink': 'kernel',
+    'kernel': 'copy',
+}
+
+# ioctl request number of FICLONE on Linux
+FICLONE = 0x40049409
+
+# Chunk size for copy_file_range / sendfile calls
+KERNEL_COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Errors meaning "this strategy does not work here", everything else (e.g. permission errors) is a real error.
+# ENOTTY is returned for FICLONE on file systems without reflinks
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS, errno.EMLINK, errno.ENOTTY}
+
+# (mode, source device, destination device) combinations which failed before
+_unsupported = set()
+
+
+def _link(source_path, dest_path):
+    try:
+        os.link(source_path, dest_path)
+    except OSError as e:
+        # File systems without hard links (e.g. FAT, some network shares) answer with EPERM
+        if e.errno == errno.EPERM:
+            raise OSError(errno.ENOTSUP, f"Hard links are not supported: {e}") from e
+        raise
+
+
+def _hardlink(source_path, dest_path):
+    if os.path.exists(dest_path):
+        if os.path.samefile(source_path, dest_path):
+            return
+        # os.link can not overwrite, link next to the destination and replace it atomically
+        temp_path = dest_path + '.link_tmp'
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        _link(source_path, temp_path)
+        os.replace(temp_path, dest_path)
+    else:
+        _link(source_path, dest_path)
+
+
+def _write_replacing(dest_path, write_function):
+    """Call write_function(temp path) and move the written file to dest_path, replacing an existing file."""
+    temp_path = dest_path + '.transfer_tmp'
+    try:
+        write_function(temp_path)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _reflink(source_path, dest_path):
+    import fcntl  # Not available on Windows, the ImportError makes the caller fall back
+
+    def clone(temp_path):
+        with open(source_path, 'rb') as source_file, open(temp_path, 'wb') as dest_file:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, source_file.fileno())
+        shutil.copymode(source_path, temp_path)
+
+    _write_replacing(dest_path, clone)
+
+
+def _kernel_copy(source_path, dest_path):
+    copy_function = getattr(os, 'copy_file_range', None)
+    if copy_function is None:
+        if not hasattr(os, 'sendfile'):
+            raise OSError(errno.ENOSYS, "Neither copy_file_range nor sendfile is available")
+        # sendfile(out, in, offset, count) takes the arguments the other way around
+        copy_function = lambda source_fd, dest_fd, count: os.sendfile(dest_fd, source_fd, None, count)
+
+    def copy(temp_path):
+        with open(source_path, 'rb') as source_file, open(temp_path, 'wb') as dest_file:
+            remaining = os.fstat(source_file.fileno()).st_size
+            while remaining > 0:
+                copied = copy_function(source_file.fileno(), dest_file.fileno(), min(remaining, KERNEL_COPY_CHUNK_SIZE))
+                if copied == 0:
+                    break
+                remaining -= copied
+        shutil.copymode(source_path, temp_path)
+
+    _write_replacing(dest_path, copy)
+
+
+def _copy(source_path, dest_path):
+    # Copy file without preserving metadata
+    _write_replacing(dest_path, lambda temp_path: shutil.copy(source_path, temp_path))
+
+
+TRANSFER_FUNCTIONS = {
+    'copy': _copy,
+    'hardlink': _hardlink,
+    'reflink': _reflink,
+    'kernel': _kernel_copy,
+}
+
+
+def _device_pair(source_path, dest_path):
+    return os.stat(source_path).st_dev, os.stat(os.path.dirname(dest_path) or '.').st_dev
+
+
+def transfer_file(source_path, dest_path, mode='copy'):
+    """Transfer source_path to dest_path with the given mode, falling back if needed. Returns the mode used."""
+    if mode not in TRANSFER_FUNCTIONS:
+        raise ValueError(f"Unknown transfer mode: {mode} (expected one of {', '.join(TRANSFER_MODES)})")
+
+    devices = _device_pair(source_path, dest_path) if mode != 'copy' else None
+    while mode != 'copy':
+        if (mode,) + devices not in _unsupported:
+            try:
+                TRANSFER_FUNCTIONS[mode](source_path, dest_path)
+                return mode
+            except (OSError, ImportError) as e:
+                if isinstance(e, OSError) and e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                _unsupported.add((mode,) + devices)
+                print(f"Transfer mode '{mode}' not supported from {source_path} to {dest_path}, using '{FALLBACK_MODES[mode]}'")
+        mode = FALLBACK_MODES[mode]
+
+    _copy(source_path, dest_path)
+    return mode
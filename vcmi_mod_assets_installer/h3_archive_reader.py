@@ -0,0 +1,268 @@
+"""
+Heroes 3 Archive Reader
+
+Pure Python reader for the original Heroes 3 archive formats, used instead of the external vcmiextract tool.
+
+Supported formats:
+- `.lod` / `.pac`: "LOD\\0" archives with an entry table of (name, offset, size, type, compressed size).
+  Entries with a compressed size are zlib streams, all others are stored as is.
+- `.snd`: Sound archives. Names are stored as "NAME\\0WAV..." so the extension follows the first null byte.
+- `.vid`: Video archives. Only offsets are stored, sizes are derived from the offset of the next entry.
+
+H3 .pcx images found in LOD archives are converted to .png while extracting, everything else is written unchanged.
+
+Usage:
+python h3_archive_reader.py <archive_file> [<output_folder>]
+
+Without an output folder the archive content is only listed.
+"""
+
+import os
+import struct
+import zlib
+import argparse
+from collections import namedtuple
+
+# Bump this whenever the extracted output for the same archive may change (naming, image conversion, ...)
+EXTRACTOR_VERSION = 1
+
+LOD_MAGIC = b'LOD\x00'
+LOD_HEADER_SIZE = 92
+LOD_ENTRY_SIZE = 32
+SND_ENTRY_SIZE = 48
+VID_ENTRY_SIZE = 44
+
+# Chunk size used when streaming entry data from the archive to the output file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# File types which are never needed by VCMI mods and are not written during extraction
+UNWANTED_EXTENSIONS = {'.txt', '.msk', '.msg', '.fnt', '.pal'}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+ArchiveEntry = namedtuple('ArchiveEntry', ['name', 'offset', 'size', 'compressed_size'])
+
+
+class ArchiveFormatError(ValueError):
+    """Raised when an archive is truncated or is not in one of the known H3 formats."""
+
+
+def _decode_name(raw_name):
+    """Decode a fixed size, null terminated entry name."""
+    return raw_name.split(b'\x00', 1)[0].decode('latin-1')
+
+
+def _read_exact(archive_file, size):
+    data = archive_file.read(size)
+    if len(data) != size:
+        raise ArchiveFormatError(f"Unexpected end of archive: {archive_file.name}")
+    return data
+
+
+def _read_lod_index(archive_file):
+    header = _read_exact(archive_file, LOD_HEADER_SIZE)
+    file_count = struct.unpack_from('<I', header, 8)[0]
+    table = _read_exact(archive_file, file_count * LOD_ENTRY_SIZE)
+
+    entries = []
+    for raw_name, offset, size, _, compressed_size in struct.iter_unpack('<16sIIII', table):
+        entries.append(ArchiveEntry(_decode_name(raw_name), offset, size, compressed_size))
+    return entries
+
+
+def _read_snd_index(archive_file):
+    file_count = struct.unpack('<I', _read_exact(archive_file, 4))[0]
+    table = _read_exact(archive_file, file_count * SND_ENTRY_SIZE)
+
+    entries = []
+    for raw_name, offset, size in struct.iter_unpack('<40sII', table):
+        # Entries look like "NAME\0WAV<garbage>": the first null byte separates name and extension
+        name, _, extension = raw_name.partition(b'\x00')
+        name = name.decode('latin-1')
+        extension = extension[:3].decode('latin-1').rstrip('\x00')
+        if extension:
+            name += '.' + extension
+        entries.append(ArchiveEntry(name, offset, size, 0))
+    return entries
+
+
+def _read_vid_index(archive_file):
+    file_count = struct.unpack('<I', _read_exact(archive_file, 4))[0]
+    table = _read_exact(archive_file, file_count * VID_ENTRY_SIZE)
+    archive_size = os.fstat(archive_file.fileno()).st_size
+
+    names_and_offsets = [(_decode_name(raw_name), offset) for raw_name, offset in struct.iter_unpack('<40sI', table)]
+
+    # Sizes are not stored, each entry ends where the next one (by offset) starts
+    sorted_offsets = sorted({offset for _, offset in names_and_offsets} | {archive_size})
+    next_offset = dict(zip(sorted_offsets, sorted_offsets[1:]))
+
+    return [ArchiveEntry(name, offset, next_offset.get(offset, archive_size) - offset, 0)
+            for name, offset in names_and_offsets]
+
+
+def read_archive_index(archive_path):
+    """Read the entry table of an H3 archive and return a list of ArchiveEntry tuples."""
+    with open(archive_path, 'rb') as archive_file:
+        magic = archive_file.read(4)
+        archive_file.seek(0)
+
+        if magic == LOD_MAGIC:
+            return _read_lod_index(archive_file)
+
+        extension = os.path.splitext(archive_path)[1].lower()
+        if extension == '.snd':
+            return _read_snd_index(archive_file)
+        if extension == '.vid':
+            return _read_vid_index(archive_file)
+
+    raise ArchiveFormatError(f"Unknown archive format: {archive_path}")
+
+
+def output_name_for_entry(entry_name):
+    """Return the file name an archive entry is extracted to (.pcx images become .png)."""
+    base_name, extension = os.path.splitext(entry_name)
+    if extension.lower() == '.pcx':
+        return base_name + '.png'
+    return entry_name
+
+
+def is_wanted_entry(entry_name):
+    """Check if an archive entry is an asset that should be extracted at all."""
+    return os.path.splitext(entry_name)[1].lower() not in UNWANTED_EXTENSIONS
+
+
+def _iter_entry_chunks(archive_file, entry):
+    """Yield the (decompressed) data of an entry in chunks."""
+    archive_file.seek(entry.offset)
+    remaining = entry.compressed_size if entry.compressed_size else entry.size
+    decompressor = zlib.decompressobj() if entry.compressed_size else None
+
+    while remaining > 0:
+        chunk = archive_file.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ArchiveFormatError(f"Entry {entry.name} is truncated in {archive_file.name}")
+        remaining -= len(chunk)
+        yield decompressor.decompress(chunk) if decompressor else chunk
+
+    if decompressor:
+        yield decompressor.flush()
+
+
+def read_entry_data(archive_file, entry):
+    """Read and decompress the full data of an entry from an already opened archive."""
+    return b''.join(_iter_entry_chunks(archive_file, entry))
+
+
+def _png_chunk(chunk_type, data):
+    chunk = chunk_type + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk) & 0xffffffff)
+
+
+def convert_pcx_to_png(data):
+    """Convert H3 .pcx image data (8 bit paletted or 24 bit BGR) to .png. Returns None for unknown layouts."""
+    if len(data) < 12:
+        return None
+    size, width, height = struct.unpack_from('<III', data, 0)
+    pixels = data[12:12 + size]
+
+    if size == width * height and len(data) >= 12 + size + 768:
+        color_type = 3
+        stride = width
+        palette = data[12 + size:12 + size + 768]
+    elif size == width * height * 3 and len(pixels) == size:
+        color_type = 2
+        stride = width * 3
+        palette = None
+        # Pixels are stored as BGR, png expects RGB
+        rgb = bytearray(size)
+        rgb[0::3] = pixels[2::3]
+        rgb[1::3] = pixels[1::3]
+        rgb[2::3] = pixels[0::3]
+        pixels = bytes(rgb)
+    else:
+        return None
+
+    # Every row starts with filter type 0 (None)
+    raw_rows = b''.join(b'\x00' + pixels[row:row + stride] for row in range(0, stride * height, stride))
+
+    png = [PNG_SIGNATURE, _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))]
+    if palette is not None:
+        png.append(_png_chunk(b'PLTE', palette))
+    png.append(_png_chunk(b'IDAT', zlib.compress(raw_rows)))
+    png.append(_png_chunk(b'IEND', b''))
+    return b''.join(png)
+
+
+def write_output_file(output_path, chunks):
+    """Write the chunks to output_path through a temporary file, replacing an existing file only once complete.
+
+    An interrupted extraction never leaves a half written file, and an existing file is replaced instead of being
+    rewritten in place (an installed hard link to it keeps the old content).
+    """
+    temp_path = output_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as output_file:
+            for chunk in chunks:
+                output_file.write(chunk)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def extract_entry(archive_file, entry, output_directory):
+    """Write a single entry to the output directory and return the name of the written file."""
+    output_name = os.path.basename(output_name_for_entry(entry.name))
+    output_path = os.path.join(output_directory, output_name)
+
+    if output_name != entry.name:
+        # Image conversion needs the whole entry in memory, H3 images are small
+        data = read_entry_data(archive_file, entry)
+        png_data = convert_pcx_to_png(data)
+        if png_data is None:
+            print(f"Unsupported pcx image, writing it unchanged: {entry.name}")
+            output_name = os.path.basename(entry.name)
+            output_path = os.path.join(output_directory, output_name)
+            png_data = data
+        write_output_file(output_path, [png_data])
+        return output_name
+
+    write_output_file(output_path, _iter_entry_chunks(archive_file, entry))
+    return output_name
+
+
+def extract_archive_entries(archive_path, output_directory, entries=None):
+    """Extract the given entries (default: all wanted entries) of an archive directly into the output directory.
+
+    Returns the list of written file names.
+    """
+    if entries is None:
+        entries = [entry for entry in read_archive_index(archive_path) if is_wanted_entry(entry.name)]
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    written_files = []
+    with open(archive_path, 'rb') as archive_file:
+        # Reading in offset order keeps the archive access sequential
+        for entry in sorted(entries, key=lambda e: e.offset):
+            if not os.path.basename(entry.name):
+                continue
+            written_files.append(extract_entry(archive_file, entry, output_directory))
+    return written_files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or extract Heroes 3 .lod/.pac/.snd/.vid archives.")
+    parser.add_argument('archive_file', help="Path to the archive.")
+    parser.add_argument('output_folder', nargs='?', help="Folder to extract the archive to. Lists entries if omitted.")
+
+    args = parser.parse_args()
+
+    if args.output_folder:
+        extracted = extract_archive_entries(args.archive_file, args.output_folder)
+        print(f"Extracted {len(extracted)} files to: {args.output_folder}")
+    else:
+        for archive_entry in read_archive_index(args.archive_file):
+            print(f"{archive_entry.name:<40} offset: {archive_entry.offset:<10} size: {archive_entry.size:<10} compressed: {archive_entry.compressed_size}")
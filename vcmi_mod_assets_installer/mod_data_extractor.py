@@ -2,12 +2,16 @@
 Heroes 3 Mod Data Extractor Script
 
 This script is designed to extract specified H3 archive files from a given source directory 
-and save the extracted files to a designated output directory. It is using vcmiextract: https://github.com/IvanSavenko/vcmiextract
+and save the extracted files to a designated output directory. Archives are read with the pure Python
+reader in `h3_archive_reader.py` (same formats as vcmiextract: https://github.com/IvanSavenko/vcmiextract).
 
 Key Features:
-- Extracts archive files using an external command-line tool (`vcmiextract`).
-- Copies extracted files from the temporary extraction directory to the specified output directory.
-- Removes unwanted file types (e.g., `.txt`, `.msk`, `.msg`, `.fnt`, `.pal`) from the output directory.
+- Extracts .lod/.pac/.snd/.vid archives without any external tool.
+- Streams the archive entries directly to the specified output directory (no temporary extraction folder).
+- Skips unwanted file types (e.g., `.txt`, `.msk`, `.msg`, `.fnt`, `.pal`) while extracting.
+- Optionally extracts several archives in parallel (`--workers`). When archives contain the same file,
+  the archive listed last wins, exactly as with sequential extraction.
+- Optionally keeps an extraction cache (`--cache_file`), so unchanged archives are skipped.
 - Optionally, it copies all MP3 files from a designated folder (located one level up) to the output directory.
 
 Usage Instructions:
@@ -23,96 +27,242 @@ Example Command: bash
 python mod_data_extractor.py /path/to/mod/data /path/to/output_folder archive1.arc archive2.arc
 """
 
-import subprocess
 import os
-import glob
 import shutil
 import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from h3_archive_reader import read_archive_index, extract_archive_entries, is_wanted_entry, output_name_for_entry, ArchiveFormatError
+from extraction_cache import load_cache, save_cache, archive_fingerprint, is_same_archive
 
 
-def extract_archive(archive_path, output_directory):
-    # Ensure the path is absolute
-    archive_path = os.path.abspath(archive_path)
+def build_archive_index(archive_path):
+    """Return all wanted entries of an archive (name, offset, size, compression) without extracting anything."""
+    return [entry for entry in read_archive_index(archive_path) if is_wanted_entry(entry.name)]
 
-    # Command to call the external program
-    command = ['./vcmi_extract/vcmiextract', archive_path]
 
-    try:
-        # Run the command and wait for it to complete
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
+def select_required_entries(entries, required_names):
+    """Keep only the entries whose extracted file name (case-insensitive) is in required_names."""
+    return [entry for entry in entries if output_name_for_entry(entry.name).lower() in required_names]
+
+
+def assign_entries_to_archives(archive_indexes):
+    """Give every output file name to the last archive that contains it.
+
+    archive_indexes is a list of (archive_path, entries) in settings order. Returns the same list with each
+    archive keeping only the entries it owns, so archives can be extracted in any order (or in parallel)
+    with the same result as extracting them one after another (last archive wins).
+    """
+    owners = {}
+    for archive_number, (_, entries) in enumerate(archive_indexes):
+        for entry in entries:
+            owners[output_name_for_entry(entry.name).lower()] = archive_number
+
+    return [(archive_path, [entry for entry in entries if owners[output_name_for_entry(entry.name).lower()] == archive_number])
+            for archive_number, (archive_path, entries) in enumerate(archive_indexes)]
 
-        # Print the output from the command
-        print("Output:", result.stdout)
-        print("Errors:", result.stderr)
 
-        # Get the directory where files are extracted
-        extract_dir = os.path.splitext(archive_path)[0]  # Remove the extension to get the folder name
+def extract_archive(archive_path, output_directory, entries=None):
+    """Extract the given entries (default: all wanted entries) of an archive into the output directory.
+
+    Returns (list of extracted file names, error message or None). Runs in worker processes in parallel mode.
+    """
+    try:
+        return extract_archive_entries(archive_path, output_directory, entries), None
+
+    except (ArchiveFormatError, OSError) as e:
+        return [], f"An error occurred while extracting {archive_path}: {e}"
 
-        # Copy extracted files to the output directory
-        copy_extracted_files(extract_dir, output_directory)
 
-        # Remove unwanted files from the output directory
-        remove_unwanted_files(output_directory)
+def is_up_to_date_copy(source_path, target_path):
+    """Check if target_path is an earlier copy of source_path (same size and not older)."""
+    if not os.path.exists(target_path):
+        return False
+    source_stat = os.stat(source_path)
+    target_stat = os.stat(target_path)
+    return source_stat.st_size == target_stat.st_size and target_stat.st_mtime >= source_stat.st_mtime
 
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred: {e}")
-        print(f"Return code: {e.returncode}")
-        print(f"Output: {e.output}")
-        print(f"Error output: {e.stderr}")
 
+def copy_mp3_folder(source_folder, output_folder, required_names=None):
+    """Copy all files from the mp3 folder (located one level up in Succession Wars mod) to the output directory.
 
-def copy_mp3_folder(source_folder, output_folder):
-    """Copy all files from the mp3 folder (located one level up in Succession Wars mod) to the output directory."""
+    Returns (number of copied files, copied bytes).
+    """
+    copied = 0
+    copied_bytes = 0
     # Copy all files from the mp3 folder to the output directory
     if os.path.exists(source_folder):
         for item in os.listdir(source_folder):
+            if required_names is not None and item.lower() not in required_names:
+                continue
             s = os.path.join(source_folder, item)
             d = os.path.join(output_folder, item)
             if os.path.isfile(s):
-                shutil.copy(s, d)  # Copy file without preserving metadata
-                print(f"Copied: {s} to {d}")
+                if is_up_to_date_copy(s, d):
+                    continue
+                # Copy file without preserving metadata, replacing (not rewriting) an installed hard link
+                shutil.copy(s, d + '.tmp')
+                os.replace(d + '.tmp', d)
+                copied += 1
+                copied_bytes += os.path.getsize(d)
+        if copied:
+            print(f"Copied {copied} files from: {source_folder}")
     else:
         print(f"Source MP3 folder not found: {source_folder}")
+    return copied, copied_bytes
+
+
+def index_archives(source_folder, archive_names):
+    """Read the entry tables of all existing archives. Returns a list of (archive_path, entries) in settings order."""
+    archive_indexes = []
+    for archive_name in archive_names:
+        archive_name = archive_name.strip()  # Remove leading/trailing whitespace
+        archive_path = os.path.join(source_folder, archive_name)  # Construct full path
+        if not os.path.exists(archive_path):
+            print(f"File not found: {archive_path}")
+            continue
 
+        try:
+            archive_indexes.append((archive_path, build_archive_index(archive_path)))
+        except (ArchiveFormatError, OSError) as e:
+            print(f"An error occurred while reading {archive_path}: {e}")
+    return archive_indexes
 
-def copy_extracted_files(source_dir, target_dir):
-    """Copy extracted files to the target directory, overwriting if they exist."""
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
 
-    for filename in os.listdir(source_dir):
-        file_path = os.path.join(source_dir, filename)
-        if os.path.isfile(file_path):
-            target_file_path = os.path.join(target_dir, filename)
-            shutil.copy(file_path, target_file_path)  # Copy file without preserving metadata
+def remove_stale_files(output_folder, cache, owners, fingerprints):
+    """Delete files of earlier runs which would otherwise be left next to (or instead of) the current files.
 
+    owners: {lower case output name: (archive key, output name)} of the current jobs, fingerprints: {archive key:
+    fingerprint} of the current archives. A file is stale when another archive owns its name now, when its archive
+    changed and now provides the name in another case, or when its archive changed and no archive contains it any
+    more. Names are compared in lower case, so on case-sensitive file systems no old variant (x.def next to X.DEF)
+    is served instead of the new file. Returns {lower case name: [file names]} of the files left in the folder.
+    """
+    existing_files = {}
+    for file_name in os.listdir(output_folder):
+        existing_files.setdefault(file_name.lower(), []).append(file_name)
 
-def remove_unwanted_files(directory):
-    # List of file extensions to remove
-    extensions_to_remove = ['*.txt', '*.msk', '*.msg', '*.fnt', '*.pal']
+    for archive_key, cached_record in cache["archives"].items():
+        changed = archive_key not in fingerprints or not is_same_archive(cached_record, fingerprints[archive_key])
+        for name in cached_record.get("extracted", []):
+            owner_key, output_name = owners.get(name, (None, None))
+            if owner_key is None:
+                stale_files = existing_files.get(name, []) if changed and archive_key in fingerprints else []
+            elif owner_key != archive_key:
+                stale_files = existing_files.get(name, [])
+            elif changed:
+                stale_files = [file_name for file_name in existing_files.get(name, []) if file_name != output_name]
+            else:
+                stale_files = []
 
-    for ext in extensions_to_remove:
-        # Use glob to find files with the given extension
-        for file_path in glob.glob(os.path.join(directory, ext)):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"Error deleting {file_path}: {e}")
+            for file_name in stale_files:
+                os.remove(os.path.join(output_folder, file_name))
+            if stale_files:
+                existing_files[name] = [file_name for file_name in existing_files[name] if file_name not in stale_files]
 
+        if archive_key not in fingerprints:
+            # Archive no longer extracted, forget the names other archives provide now
+            cached_record["extracted"] = sorted(name for name in cached_record.get("extracted", []) if name not in owners)
 
-def extract_files(source_folder, archive_names, output_folder):
-    """Extracts files from specified archives to output directory."""
-    for archive_name in archive_names:
-        archive_name = archive_name.strip()  # Remove leading/trailing whitespace
-        archive_path = os.path.join(source_folder, archive_name)  # Construct full path
-        if os.path.exists(archive_path):
+    return {name: file_names for name, file_names in existing_files.items() if file_names}
+
+
+def skip_cached_entries(jobs, output_folder, cache):
+    """Remove entries which were already extracted from an unchanged archive and update the cache records.
+
+    Stale files of earlier runs are deleted first (see remove_stale_files). Returns the remaining jobs.
+    """
+    owners = {}
+    for archive_path, entries in jobs:
+        for entry in entries:
+            output_name = output_name_for_entry(entry.name)
+            owners[output_name.lower()] = (os.path.abspath(archive_path), output_name)
+    fingerprints = {}
+    for archive_path, _ in jobs:
+        archive_key = os.path.abspath(archive_path)
+        fingerprints[archive_key] = archive_fingerprint(archive_path, cache["archives"].get(archive_key))
+
+    existing_files = remove_stale_files(output_folder, cache, owners, fingerprints)
+
+    remaining_jobs = []
+    for archive_path, entries in jobs:
+        archive_key = os.path.abspath(archive_path)
+        cached_record = cache["archives"].get(archive_key)
+        fingerprint = fingerprints[archive_key]
+
+        if is_same_archive(cached_record, fingerprint):
+            already_extracted = set(cached_record.get("extracted", [])) & existing_files.keys()
+        else:
+            already_extracted = set()
+
+        entry_names = {output_name_for_entry(entry.name).lower() for entry in entries}
+        cache["archives"][archive_key] = dict(fingerprint, extracted=sorted(already_extracted & entry_names))
+
+        entries = [entry for entry in entries if output_name_for_entry(entry.name).lower() not in already_extracted]
+        if entries:
+            remaining_jobs.append((archive_path, entries))
+        else:
+            print(f"Unchanged, skipping: {os.path.basename(archive_path)}")
+    return remaining_jobs
+
+
+def extract_files(source_folder, archive_names, output_folder, required_names=None, workers=1, cache_path=None):
+    """Extracts files from specified archives to output directory.
+
+    If required_names (set of lower case file names) is given, only the referenced assets are extracted.
+    With workers > 1 the archives are extracted in parallel by a process pool.
+    With a cache_path, files already extracted from unchanged archives are not extracted again.
+    Returns a Counter with the number of archives, extracted files and bytes (for the run report).
+    """
+    stats = Counter()
+    if required_names is not None:
+        print(f"Selective extraction: {len(required_names)} referenced assets")
+
+    os.makedirs(output_folder, exist_ok=True)
+    jobs = assign_entries_to_archives(index_archives(source_folder, archive_names))
+    stats["archives"] = len(jobs)
+
+    cache = load_cache(cache_path) if cache_path else None
+    if cache is not None:
+        jobs = skip_cached_entries(jobs, output_folder, cache)
+        stats["archives_unchanged"] = stats["archives"] - len(jobs)
+
+    if required_names is not None:
+        jobs = [(archive_path, select_required_entries(entries, required_names)) for archive_path, entries in jobs]
+        jobs = [(archive_path, entries) for archive_path, entries in jobs if entries]
+
+    if workers > 1 and len(jobs) > 1:
+        print(f"Extracting {len(jobs)} archives with {min(workers, len(jobs))} workers")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            results = list(executor.map(extract_archive, [archive_path for archive_path, _ in jobs],
+                                        [output_folder] * len(jobs), [entries for _, entries in jobs]))
+    else:
+        results = []
+        for archive_path, entries in jobs:
             print(f"Starting extracting: {os.path.basename(archive_path)}")
-            extract_archive(archive_path, output_folder)
+            results.append(extract_archive(archive_path, output_folder, entries))
+
+    for (archive_path, _), (extracted_files, error) in zip(jobs, results):
+        if error:
+            stats["archives_failed"] += 1
+            print(error)
         else:
-            print(f"File not found: {archive_path}")
+            print(f"Extracted {len(extracted_files)} files from: {os.path.basename(archive_path)}")
+        stats["archive_bytes"] += os.path.getsize(archive_path)
+        stats["extracted"] += len(extracted_files)
+        stats["extracted_bytes"] += sum(os.path.getsize(os.path.join(output_folder, name)) for name in extracted_files)
+
+        if cache is not None:
+            # Only files that were really written are remembered, failed archives are retried on the next run
+            cached_record = cache["archives"][os.path.abspath(archive_path)]
+            cached_record["extracted"] = sorted(set(cached_record["extracted"]) | {name.lower() for name in extracted_files})
+
+    if cache is not None:
+        save_cache(cache_path, cache)
 
     mp3_folder_path = os.path.join(os.path.dirname(source_folder), 'mp3') # mp3 folder is one level above data folder
-    copy_mp3_folder(mp3_folder_path, output_folder)
+    stats["mp3_copied"], stats["mp3_copied_bytes"] = copy_mp3_folder(mp3_folder_path, output_folder, required_names)
+    return stats
 
 
 # Entry point for standalone execution
@@ -121,10 +271,22 @@ if __name__ == "__main__":
     parser.add_argument('mod_data_folder', nargs='?', help="Directory containing the archive files.")
     parser.add_argument('mod_data_out_folder', nargs='?', help="Directory to save extracted files.")
     parser.add_argument('archive_files', nargs='*', help="List of archive names to extract.")
+    parser.add_argument('--selective_mapping_file', type=str, default=None,
+                        help="assets_to_paths_mapping.txt: extract only the assets referenced there (and in overridden_assets.txt files).")
+    parser.add_argument('--vcmi_mod_folder', type=str, default=None,
+                        help="VCMI mod folder searched for overridden_assets.txt files in selective mode.")
+    parser.add_argument('--workers', type=int, default=1, help="Number of archives extracted in parallel.")
+    parser.add_argument('--cache_file', type=str, default=None,
+                        help="Extraction cache file. Files from unchanged archives are not extracted again.")
 
     args = parser.parse_args()
 
     if args.archive_files:
         archive_names = args.archive_files
 
-    extract_files(args.mod_data_folder, archive_names, args.mod_data_out_folder)
+    required_names = None
+    if args.selective_mapping_file:
+        from copy_mod_files import collect_required_asset_names
+        required_names = collect_required_asset_names(args.selective_mapping_file, args.vcmi_mod_folder)
+
+    extract_files(args.mod_data_folder, archive_names, args.mod_data_out_folder, required_names, args.workers, args.cache_file)
@@ -0,0 +1,139 @@
+"""
+Run Report
+
+Per-stage instrumentation of the installer. Every stage (extraction, scan, copy, ...) records its wall and CPU time,
+peak memory, bytes read and written by the process and the counters of the step (files scanned, parsed, skipped,
+copied, missing assets, ...). The report is written as JSON to out/run_report.json after every run.
+
+With a profile folder every stage also runs under cProfile and its stats are written to <profile folder>/<stage>.prof.
+View them with `python -m pstats out/profile/scan.prof` (or snakeviz). Worker processes are not profiled.
+
+Platform notes:
+- Peak memory needs the `resource` module (not available on Windows, reported as null there).
+- CPU time, memory and bytes are counted for the whole process, so stages running at the same time (see
+  stage_scheduler.py) include each other's work.
+- Bytes read/written come from /proc/self/io (Linux only, null elsewhere) and include every read/write call
+  of the installer process, also the ones served from the OS file cache.
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+RUN_REPORT_VERSION = 1
+
+
+def get_peak_rss():
+    """Return (peak RSS of this process, peak RSS of the largest finished worker process) in bytes, or (None, None)."""
+    if resource is None:
+        return None, None
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def get_io_counters():
+    """Return (bytes read, bytes written) by this process so far, or (None, None) if unknown."""
+    try:
+        with open('/proc/self/io', 'r') as io_file:
+            counters = dict(line.split(':') for line in io_file if ':' in line)
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _seconds(duration):
+    # Differences of float clock values can be slightly negative
+    return max(0.0, round(duration, 4))
+
+
+def _difference(end, start):
+    return end - start if end is not None and start is not None else None
+
+
+class RunReport:
+    """Collect the measurements of all stages of one installer run. Use stage() around every step, then save()."""
+
+    def __init__(self, profile_folder=None):
+        self.started = time.time()
+        self.start_wall = time.perf_counter()
+        self.profile_folder = profile_folder
+        self.settings = {}
+        self.stages = []
+        if profile_folder:
+            os.makedirs(profile_folder, exist_ok=True)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Measure the with block as stage `name`. Yields a dict the step adds its counters to."""
+        counters = {}
+        profiler = cProfile.Profile() if self.profile_folder else None
+        start_times = os.times()
+        start_io = get_io_counters()
+        start_wall = time.perf_counter()
+        status = "failed"
+        if profiler:
+            profiler.enable()
+        try:
+            yield counters
+            status = "ok"
+        finally:
+            if profiler:
+                profiler.disable()
+            end_wall = time.perf_counter()
+            end_times = os.times()
+            end_io = get_io_counters()
+            peak_rss, peak_rss_workers = get_peak_rss()
+
+            stage = {
+                "name": name,
+                "status": status,
+                # Offset from the start of the run, stages run by the stage scheduler can overlap
+                "start_seconds": _seconds(start_wall - self.start_wall),
+                "wall_seconds": _seconds(end_wall - start_wall),
+                "cpu_seconds": _seconds(end_times.user + end_times.system - start_times.user - start_times.system),
+                # CPU time of worker processes (process pools), counted when they finished
+                "cpu_seconds_workers": _seconds(end_times.children_user + end_times.children_system
+                                                - start_times.children_user - start_times.children_system),
+                "peak_rss_bytes": peak_rss,
+                "peak_rss_workers_bytes": peak_rss_workers,
+                "read_bytes": _difference(end_io[0], start_io[0]),
+                "written_bytes": _difference(end_io[1], start_io[1]),
+                "counters": counters,
+            }
+            if profiler:
+                stage["profile"] = os.path.join(self.profile_folder, f"{name}.prof")
+                profiler.dump_stats(stage["profile"])
+            self.stages.append(stage)
+
+    def to_dict(self):
+        peak_rss, peak_rss_workers = get_peak_rss()
+        return {
+            "version": RUN_REPORT_VERSION,
+            "started": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            "wall_seconds": round(time.perf_counter() - self.start_wall, 4),
+            "peak_rss_bytes": peak_rss,
+            "peak_rss_workers_bytes": peak_rss_workers,
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "settings": self.settings,
+            "stages": self.stages,
+        }
+
+    def save(self, report_path):
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+
+    def print_summary(self):
+        """Print one line per stage, the details are in the JSON report."""
+        for stage in self.stages:
+            print(f"{stage['name']:<24} {stage['wall_seconds']:8.2f} s wall {stage['cpu_seconds']:8.2f} s cpu"
+                  + (f" ({stage['status']})" if stage['status'] != "ok" else ""))
@@ -0,0 +1,65 @@
+"""
+Stage Scheduler
+
+Runs the installer stages as a small dependency graph. Every stage starts as soon as all stages it depends on are
+finished, so independent stages (archive extraction and the JSON scan) run at the same time and the wall time gets
+close to the slowest chain of stages instead of the sum of all of them.
+
+Stages run in threads. The heavy parts of extraction and scan use process pools (`workers` settings), the threads
+only wait for them; with a single worker the stages still overlap on file I/O and zlib decompression.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# function is called with the dict of results of all finished stages (by stage name) and returns the stage result
+Stage = namedtuple('Stage', ['name', 'function', 'dependencies'])
+
+
+def check_stages(stages):
+    """Raise ValueError for duplicate stage names, unknown dependencies and dependency cycles."""
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {', '.join(names)}")
+    for stage in stages:
+        unknown = set(stage.dependencies) - set(names)
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(sorted(unknown))}")
+
+    finished = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if finished.issuperset(stage.dependencies)]
+        if not ready:
+            raise ValueError(f"Cyclic stage dependencies: {', '.join(stage.name for stage in remaining)}")
+        finished.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage not in ready]
+
+
+def run_stages(stages, parallel=True):
+    """Run the stages (list of Stage) in dependency order. Returns {stage name: result}.
+
+    With parallel=False the stages run one at a time (in list order, as far as the dependencies allow).
+    If a stage fails no further stages are started; the exception is raised once the running stages finished.
+    """
+    check_stages(stages)
+    results = {}
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=len(stages) if parallel else 1) as executor:
+        while pending or running:
+            for stage in [stage for stage in pending if all(name in results for name in stage.dependencies)]:
+                pending.remove(stage)
+                running[executor.submit(stage.function, results)] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                if future.exception() is not None:
+                    # Let the running stages finish, then report the failure
+                    pending.clear()
+                    wait(running)
+                    raise future.exception()
+                results[stage.name] = future.result()
+    return results
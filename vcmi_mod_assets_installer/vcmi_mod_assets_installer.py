@@ -20,84 +20,402 @@ vcmi_mod_folder = /path/to/vcmi/mod
 [Archives]
 files = archive1.zip, archive2.zip
 
+[Extraction]
+# Extract only the assets referenced by the VCMI mod (JSON files and overridden_assets.txt)
+selective = no
+# Number of archives extracted in parallel (can be overridden with --workers)
+workers = 1
+
+[Pipeline]
+# Pass the assets between the steps in memory instead of through the mapping text files
+streaming = yes
+# Also write out/assets_to_paths_mapping_raw.txt and out/assets_to_paths_mapping.txt in streaming mode
+write_debug_files = yes
+# Keep the final asset mapping in the indexed store out/assets_mapping.sqlite (queries: see asset_mapping.py)
+mapping_store = yes
+# Run the archive extraction and the JSON scan at the same time (always off with --profile)
+parallel_stages = yes
+
+[Scan]
+# Number of processes parsing the VCMI mod JSON files in parallel (can be overridden with --scan_workers)
+workers = 1
+# Parse only JSON files changed since the last run (results of the others are kept in out/json_scan_manifest.json)
+incremental = yes
+
+[Install]
+# How assets are transferred to the VCMI mod: copy, hardlink, reflink or kernel (can be overridden with --transfer)
+transfer = copy
+# How installed files are checked to be up to date: mtime, hash or none (always copy)
+compare = mtime
+# Number of threads copying files in parallel, helps most on network shares and slow disks (can be overridden with --copy_workers)
+workers = 4
+
+# Batch install: instead of [Paths] one section per VCMI mod (optional files, default: [Archives] files).
+# Profiles with the same data folder and archives share the extraction, run a subset with --install_profiles
+[Profile mod1]
+mod_data_folder = /path/to/mod1/data
+vcmi_mod_folder = /path/to/vcmi/mod1
+
+[Profile mod2]
+mod_data_folder = /path/to/mod1/data
+vcmi_mod_folder = /path/to/vcmi/mod2
+files = archive1.zip
+
 """
 
 import configparser
 import os
+import argparse
+import hashlib
+import itertools
+import multiprocessing
 from mod_data_extractor import extract_files
-from extract_resources_and_their_relative_paths import process_json_files
-from calculate_actual_relative_paths_for_assets import calculate_actual_paths_for_assets
-from copy_mod_files import copy_assets
+from collections import Counter, namedtuple
+from extract_resources_and_their_relative_paths import process_json_files, iter_asset_records, print_scan_summary, load_scan_manifest, save_scan_manifest, get_scan_counters
+from calculate_actual_relative_paths_for_assets import calculate_actual_paths_for_assets, iter_actual_paths, write_mapping_file
+from file_transfer import TRANSFER_MODES
+from asset_mapping import store_mapping_records, import_mapping_file, iter_store_records, read_store_file_names
+from run_report import RunReport
+from asset_index import build_asset_index
+from stage_scheduler import Stage, run_stages
+from copy_mod_files import COMPARE_MODES, COPY_WORKERS, copy_assets, collect_required_asset_names, copy_asset_pairs, iter_record_pairs, iter_overridden_pairs, find_overridden_asset_names
+
+
+# Sections [Profile <name>] describe one install each (batch install), otherwise [Paths] is used
+PROFILE_SECTION_PREFIX = 'Profile '
+
+# name is None for the single install of [Paths], which keeps its files directly in out/
+InstallProfile = namedtuple('InstallProfile', ['name', 'mod_data_folder', 'vcmi_mod_folder', 'archive_names', 'out_folder'])
+
+# Profiles extracting the same archives of the same original mod share one extraction folder and cache
+ExtractionGroup = namedtuple('ExtractionGroup', ['name', 'mod_data_folder', 'archive_names', 'mod_data_out_folder', 'cache_path', 'profiles'])
+
+InstallSettings = namedtuple('InstallSettings', ['selective', 'streaming', 'parallel_stages', 'write_debug_files', 'mapping_store',
+                                                 'incremental_scan', 'extraction_workers', 'scan_workers', 'transfer_mode',
+                                                 'compare_mode', 'copy_workers'])
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract assets from an original H3 mod and install them into a VCMI mod.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of archives extracted in parallel (default: [Extraction] workers from settings.ini).")
+    parser.add_argument('--scan_workers', type=int, default=None,
+                        help="Number of processes parsing JSON files in parallel (default: [Scan] workers from settings.ini).")
+    parser.add_argument('--transfer', type=str, choices=TRANSFER_MODES, default=None,
+                        help="How assets are transferred: copy, hardlink, reflink or kernel (default: [Install] transfer from settings.ini).")
+    parser.add_argument('--copy_workers', type=int, default=None,
+                        help="Number of threads copying assets in parallel (default: [Install] workers from settings.ini).")
+    parser.add_argument('--force_extract', action='store_true',
+                        help="Ignore the extraction cache and extract all archives again.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Run every stage under cProfile and write the stats to out/profile/<stage>.prof.")
+    parser.add_argument('--install_profiles', type=str, nargs='+', default=None,
+                        help="Batch install: run only these [Profile <name>] sections of settings.ini (default: all).")
+    args = parser.parse_args()
+
     # Read settings from the INI file
     config = configparser.ConfigParser()
     config.read('settings.ini')
-    
-    mod_data_folder = config['Paths']['mod_data_folder']
-    vcmi_mod_folder = config['Paths']['vcmi_mod_folder']
 
-    # Ensure the directories exist
-    if not os.path.exists(mod_data_folder):
-        print(f"Input directory does not exist: {mod_data_folder}")
-        return
-    
     # Get the current directory and set the temporary output folder
     current_directory = os.getcwd()
     out_folder = os.path.join(current_directory, 'out')  # Create the output path
 
+    profiles = read_install_profiles(config, out_folder)
+    if args.install_profiles:
+        unknown_names = set(args.install_profiles) - {profile.name for profile in profiles}
+        if unknown_names:
+            print(f"Unknown install profiles: {', '.join(sorted(unknown_names))}")
+            return
+        profiles = [profile for profile in profiles if profile.name in args.install_profiles]
+
+    # Ensure the directories exist
+    for profile in profiles:
+        if not os.path.exists(profile.mod_data_folder):
+            print(f"Input directory does not exist: {profile.mod_data_folder}")
+            return
+        if not os.path.exists(profile.vcmi_mod_folder):
+            print(f"Error! VCMI mod folder does not exist: {profile.vcmi_mod_folder}")
+            return
+
+    # Check the settings before any work is done, invalid values would otherwise only fail in the copy threads
+    settings = read_install_settings(args, config)
+    if settings.transfer_mode not in TRANSFER_MODES:
+        print(f"Error! Unknown [Install] transfer in settings.ini: {settings.transfer_mode} (expected one of {', '.join(TRANSFER_MODES)})")
+        return
+    if settings.compare_mode not in COMPARE_MODES:
+        print(f"Error! Unknown [Install] compare in settings.ini: {settings.compare_mode} (expected one of {', '.join(COMPARE_MODES)})")
+        return
+
     if not os.path.exists(out_folder):
         print(f"Temporary output directory does not exist, creating: {out_folder}")
         os.makedirs(out_folder)
 
-    temp_mod_data_folder = os.path.join(out_folder, 'mod_data')
+    # Time, memory and counters of every stage, written to out/run_report.json also when the run fails
+    report = RunReport(os.path.join(out_folder, 'profile') if args.profile else None)
+    try:
+        install(settings, profiles, group_profiles_by_extraction(profiles, out_folder),
+                report, args.force_extract, out_folder)
+    finally:
+        run_report_path = os.path.join(out_folder, 'run_report.json')
+        report.save(run_report_path)
+        report.print_summary()
+        print(f"Run report written to: {run_report_path}")
+
+
+def split_archive_names(archive_names):
+    return [archive_name.strip() for archive_name in archive_names.split(',') if archive_name.strip()]
+
+
+def read_install_profiles(config, out_folder):
+    """Return the InstallProfiles of the settings: one per [Profile <name>] section, or the single [Paths] install.
+
+    A profile section has mod_data_folder, vcmi_mod_folder and optionally files (default: [Archives] files).
+    """
+    default_archive_names = config.get('Archives', 'files', fallback='')
+    profiles = []
+    for section in config.sections():
+        if section.startswith(PROFILE_SECTION_PREFIX):
+            name = section[len(PROFILE_SECTION_PREFIX):].strip()
+            profiles.append(InstallProfile(name, config[section]['mod_data_folder'], config[section]['vcmi_mod_folder'],
+                                           split_archive_names(config.get(section, 'files', fallback=default_archive_names)),
+                                           os.path.join(out_folder, name)))
+    if not profiles:
+        profiles.append(InstallProfile(None, config['Paths']['mod_data_folder'], config['Paths']['vcmi_mod_folder'],
+                                       split_archive_names(default_archive_names), out_folder))
+    return profiles
+
+
+def read_install_settings(args, config):
+    """Return the InstallSettings shared by all profiles, command line options override settings.ini."""
+    return InstallSettings(
+        selective=config.getboolean('Extraction', 'selective', fallback=False),
+        streaming=config.getboolean('Pipeline', 'streaming', fallback=True),
+        # cProfile can only profile one stage at a time
+        parallel_stages=config.getboolean('Pipeline', 'parallel_stages', fallback=True) and not args.profile,
+        write_debug_files=config.getboolean('Pipeline', 'write_debug_files', fallback=True),
+        mapping_store=config.getboolean('Pipeline', 'mapping_store', fallback=True),
+        incremental_scan=config.getboolean('Scan', 'incremental', fallback=True),
+        extraction_workers=args.workers if args.workers is not None else config.getint('Extraction', 'workers', fallback=1),
+        scan_workers=args.scan_workers if args.scan_workers is not None else config.getint('Scan', 'workers', fallback=1),
+        transfer_mode=args.transfer or config.get('Install', 'transfer', fallback='copy').strip(),
+        compare_mode=config.get('Install', 'compare', fallback='mtime').strip(),
+        copy_workers=args.copy_workers if args.copy_workers is not None else config.getint('Install', 'workers', fallback=COPY_WORKERS))
+
+
+def group_profiles_by_extraction(profiles, out_folder):
+    """Group the profiles using the same original mod data folder and archives (in the same order).
 
-    # Check if mod_data folder already exists and ask user if they want to reuse it
-    skip_extraction = False
-    if os.path.exists(temp_mod_data_folder) and os.listdir(temp_mod_data_folder):
-        print(f"\nFound existing mod_data folder: {temp_mod_data_folder}")
-        response = input("Do you want to reuse the existing extracted files? (y/n): ").strip().lower()
-        if response == 'y' or response == 'yes':
-            print("Reusing existing mod_data folder. Skipping extraction...")
-            skip_extraction = True
+    The single [Paths] install extracts to out/mod_data as before. Batch groups extract to out/extracted/<id>/,
+    the id is derived from data folder and archives, so the cache survives reordering or renaming profiles.
+    Profiles with the same data folder but other archive lists are not merged: the archive listed last wins for
+    files several archives contain, so a subset (or another order) of the archives can give other files.
+    """
+    profiles_by_source = {}
+    for profile in profiles:
+        source_key = (os.path.normcase(os.path.abspath(profile.mod_data_folder)), tuple(name.lower() for name in profile.archive_names))
+        profiles_by_source.setdefault(source_key, []).append(profile)
+
+    groups = []
+    for source_key, group_profiles in profiles_by_source.items():
+        if group_profiles[0].name is None:
+            name = None
+            extraction_folder = out_folder
         else:
-            print("Will re-extract files to mod_data folder...")
+            name = '+'.join(profile.name for profile in group_profiles)
+            extraction_folder = os.path.join(out_folder, 'extracted', hashlib.sha1(repr(source_key).encode('utf-8')).hexdigest()[:8])
+        groups.append(ExtractionGroup(name, group_profiles[0].mod_data_folder, group_profiles[0].archive_names,
+                                      os.path.join(extraction_folder, 'mod_data'), os.path.join(extraction_folder, 'extraction_cache.json'),
+                                      group_profiles))
 
-    if not skip_extraction:
-        if not os.path.exists(temp_mod_data_folder):
-            print(f"Creating Temporary mod data folder for data extraction: {temp_mod_data_folder}")
-            os.makedirs(temp_mod_data_folder)
+    data_folders = [source_key[0] for source_key in profiles_by_source]
+    for data_folder in sorted(set(data_folders)):
+        if data_folders.count(data_folder) > 1:
+            group_names = ', '.join(group.name for group in groups if os.path.normcase(os.path.abspath(group.mod_data_folder)) == data_folder)
+            print(f"Note: profiles {group_names} use the same mod data folder with different archive lists, their archives are "
+                  f"extracted separately (use the same 'files' list to extract them once)")
+    return groups
 
-        # Get the list of archive names from the INI settings or define a default
-        archive_names = config.get('Archives', 'files').split(',')
 
-        # Call the function to extract files with the archive names
-        print(f"Start extracting original mod assets from: {mod_data_folder}")
-        extract_files(mod_data_folder, archive_names, temp_mod_data_folder)
+def folders_overlap(folder1, folder2):
+    """Check if two folders are the same or one contains the other."""
+    path1 = os.path.normcase(os.path.abspath(folder1))
+    path2 = os.path.normcase(os.path.abspath(folder2))
+    return path1 == path2 or path1.startswith(path2.rstrip(os.sep) + os.sep) or path2.startswith(path1.rstrip(os.sep) + os.sep)
 
-    assets_to_paths_mapping_raw_file_path = os.path.join(out_folder, 'assets_to_paths_mapping_raw.txt') 
 
-    if not os.path.exists(vcmi_mod_folder):
-        print(f"Error! VCMI mod folder does not exist: {vcmi_mod_folder}")
-        return
+def get_stage_name(stage, name):
+    # The single install keeps the plain stage names
+    return f"{stage} {name}" if name else stage
+
+
+def install(settings, profiles, groups, report, force_extract=False, out_folder=None):
+    """Install all profiles. Returns {profile name: copy stats Counter}.
+
+    out_folder (with the run report, caches and manifests) is never searched for JSON or overridden_assets.txt files,
+    also when it lies inside a VCMI mod folder.
+    """
+    report.settings = dict(settings._asdict(), profiles=[dict(profile._asdict()) for profile in profiles])
+
+    excluded_folders = [out_folder] if out_folder else []
+    excluded_folders += [os.path.dirname(group.cache_path) for group in groups] + [profile.out_folder for profile in profiles]
+
+    stages = []
+    for group in groups:
+        # Archives which did not change since the last run are not extracted again (see extraction_cache.py)
+        if force_extract and os.path.exists(group.cache_path):
+            print("Forced extraction, ignoring the extraction cache...")
+            os.remove(group.cache_path)
+
+        for profile in group.profiles:
+            stages.append(Stage(get_stage_name("scan", profile.name), create_scan_stage(profile, settings, report, excluded_folders), []))
+
+        # The scan does not need the extracted files, so scans and extraction run at the same time. In selective
+        # mode the needed assets have to be known before extracting, so extraction waits for the scans of the group
+        stages.append(Stage(get_stage_name("extract", group.name), create_extract_stage(group, settings, report, excluded_folders),
+                            [get_stage_name("scan", profile.name) for profile in group.profiles] if settings.selective else []))
+
+    for profile_number, profile in enumerate(profiles):
+        group = next(group for group in groups if profile in group.profiles)
+        # Copying needs the scan and the extraction; profiles installing into the same folder copy one after another
+        dependencies = [get_stage_name("scan", profile.name), get_stage_name("extract", group.name)]
+        dependencies += [get_stage_name("copy", earlier_profile.name) for earlier_profile in profiles[:profile_number]
+                         if folders_overlap(earlier_profile.vcmi_mod_folder, profile.vcmi_mod_folder)]
+        stages.append(Stage(get_stage_name("copy", profile.name), create_copy_stage(profile, group, settings, report, excluded_folders), dependencies))
+
+    results = run_stages(stages, settings.parallel_stages)
+    copy_stats = {profile.name: results[get_stage_name("copy", profile.name)] for profile in profiles}
+    if profiles[0].name is not None:
+        print_batch_summary(copy_stats)
+    return copy_stats
+
+
+def get_mapping_paths(profile):
+    """Return the (raw mapping, final mapping) file paths of a profile."""
+    return (os.path.join(profile.out_folder, 'assets_to_paths_mapping_raw.txt'),
+            os.path.join(profile.out_folder, 'assets_to_paths_mapping.txt'))
+
+
+def create_scan_stage(profile, settings, report, excluded_folders=()):
+    """Return the scan stage function (steps 4-5) of a profile. In streaming mode it returns the store of the AssetRecords."""
+    stage_name = get_stage_name("scan", profile.name)
+    raw_mapping_path, mapping_path = get_mapping_paths(profile)
+    mapping_store_path = os.path.join(profile.out_folder, 'assets_mapping.sqlite') if settings.mapping_store else None
+    scan_manifest_path = os.path.join(profile.out_folder, 'json_scan_manifest.json') if settings.incremental_scan else None
+
+    def scan_streaming(results):
+        # Steps 4-5 as one pipeline. The records are handed to the copy step through the mapping store (a temporary
+        # one without mapping_store), so they are never all in memory at once
+        records_store_path = get_records_store_path(profile, settings)
+        print(f"Calculate needed assets for VCMI Mod: {profile.vcmi_mod_folder}")
+        with report.stage(stage_name) as counters:
+            scan_stats = Counter()
+            scan_manifest = load_scan_manifest(scan_manifest_path, profile.vcmi_mod_folder) if scan_manifest_path else None
+            records = iter_asset_records(profile.vcmi_mod_folder, raw_mapping_path if settings.write_debug_files else None,
+                                         settings.scan_workers, scan_stats, scan_manifest, excluded_folders)
+            records = iter_actual_paths(records)
+            if settings.write_debug_files:
+                records = write_mapping_file(records, mapping_path)
+            for _ in store_mapping_records(records, records_store_path):
+                pass
+            if scan_manifest is not None:
+                save_scan_manifest(scan_manifest_path, scan_manifest)
+            counters.update(get_scan_counters(scan_stats))
+        print_scan_summary(scan_stats)
+        return records_store_path
+
+    def scan_files(results):
+        # Read all the needed assets for vcmi_mod
+        print(f"Calculate needed assets for VCMI Mod: {profile.vcmi_mod_folder}")
+        with report.stage(stage_name) as counters:
+            counters.update(get_scan_counters(process_json_files(profile.vcmi_mod_folder, raw_mapping_path, settings.scan_workers,
+                                                                  scan_manifest_path, excluded_folders)))
+
+        # Call the parse_file function from the original script directly
+        print(f"Calculating actual paths for assets: from {raw_mapping_path} to {mapping_path}")
+        with report.stage(get_stage_name("calculate", profile.name)):
+            calculate_actual_paths_for_assets(raw_mapping_path, mapping_path)
+        if mapping_store_path:
+            with report.stage(get_stage_name("mapping_store", profile.name)) as counters:
+                counters["entries"] = import_mapping_file(mapping_store_path, mapping_path)
+
+    def scan(results):
+        os.makedirs(profile.out_folder, exist_ok=True)
+        # Clear the output file at the start
+        with open(raw_mapping_path, 'w', encoding='utf-8') as out_file:
+            out_file.write("")
+        return scan_streaming(results) if settings.streaming else scan_files(results)
+
+    return scan
+
+
+def get_records_store_path(profile, settings):
+    """Return the store handing the AssetRecords from the scan to the copy step in streaming mode."""
+    return os.path.join(profile.out_folder, 'assets_mapping.sqlite' if settings.mapping_store else 'assets_records.sqlite')
+
+
+def create_extract_stage(group, settings, report, excluded_folders=()):
+    """Return the extraction stage function (step 3) of an extraction group."""
+    def extract(results):
+        required_names = None
+        if settings.selective:
+            # Only the assets found by the scans (and the overridden assets) of the group are extracted
+            required_names = set()
+            for profile in group.profiles:
+                if settings.streaming:
+                    required_names |= read_store_file_names(results[get_stage_name("scan", profile.name)])
+                    required_names |= find_overridden_asset_names(profile.vcmi_mod_folder, excluded_folders)
+                else:
+                    required_names |= collect_required_asset_names(get_mapping_paths(profile)[1], profile.vcmi_mod_folder, excluded_folders)
+        with report.stage(get_stage_name("extract", group.name)) as counters:
+            counters.update(extract_mod_data(group.mod_data_folder, group.archive_names, group.mod_data_out_folder, group.cache_path,
+                                             required_names, settings.extraction_workers))
+
+    return extract
+
+
+def create_copy_stage(profile, group, settings, report, excluded_folders=()):
+    """Return the copy stage function (step 6) of a profile. It returns the copy stats."""
+    def copy(results):
+        with report.stage(get_stage_name("copy", profile.name)) as counters:
+            if settings.streaming:
+                # Overridden assets come last and win for the same destination
+                records_store_path = results[get_stage_name("scan", profile.name)]
+                pairs = itertools.chain(iter_record_pairs(iter_store_records(records_store_path), group.mod_data_out_folder, profile.vcmi_mod_folder),
+                                        iter_overridden_pairs(profile.vcmi_mod_folder, group.mod_data_out_folder, excluded_folders))
+                # The extracted assets are indexed once, all lookups are case-insensitive dictionary lookups
+                copy_stats = copy_asset_pairs(pairs, settings.transfer_mode, settings.compare_mode, settings.copy_workers,
+                                              build_asset_index(group.mod_data_out_folder))
+                if not settings.mapping_store:
+                    os.remove(records_store_path)  # Only the temporary hand-over store, not the kept mapping store
+            else:
+                copy_stats = copy_assets(get_mapping_paths(profile)[1], group.mod_data_out_folder, profile.vcmi_mod_folder,
+                                         settings.transfer_mode, settings.compare_mode, settings.copy_workers, excluded_folders)
+            counters.update(copy_stats)
+        return copy_stats
+
+    return copy
 
-    # Clear the output file at the start
-    with open(assets_to_paths_mapping_raw_file_path, 'w', encoding='utf-8') as out_file:
-        out_file.write("")
 
-    # Read all the needed assets for vcmi_mod
-    print(f"Calculate needed assets for VCMI Mod: {vcmi_mod_folder}")
-    process_json_files(vcmi_mod_folder, assets_to_paths_mapping_raw_file_path)
+def print_batch_summary(copy_stats):
+    """Print one line per profile and the totals of a batch install."""
+    print(f"Installed {len(copy_stats)} profiles:")
+    for name, stats in list(copy_stats.items()) + [("Total", sum(copy_stats.values(), Counter()))]:
+        print(f"  {name}: {stats['referenced']} assets referenced, {stats['missing']} not found, {stats['copied']} copied "
+              f"({stats['copied_bytes']} bytes), {stats['up_to_date']} up to date" + (f", {stats['failed']} failed" if stats['failed'] else ""))
 
-    assets_to_paths_mapping_file_path = os.path.join(out_folder, 'assets_to_paths_mapping.txt')
 
-    # Call the parse_file function from the original script directly
-    print(f"Calculating actual paths for assets: from {assets_to_paths_mapping_raw_file_path} to {assets_to_paths_mapping_file_path}")
-    calculate_actual_paths_for_assets(assets_to_paths_mapping_raw_file_path, assets_to_paths_mapping_file_path)
+def extract_mod_data(mod_data_folder, archive_names, temp_mod_data_folder, cache_path, required_names=None, workers=1):
+    if not os.path.exists(temp_mod_data_folder):
+        print(f"Creating Temporary mod data folder for data extraction: {temp_mod_data_folder}")
+        os.makedirs(temp_mod_data_folder)
 
-    copy_assets(assets_to_paths_mapping_file_path, temp_mod_data_folder, vcmi_mod_folder)
+    # Call the function to extract files with the archive names
+    print(f"Start extracting original mod assets from: {mod_data_folder}")
+    return extract_files(mod_data_folder, archive_names, temp_mod_data_folder, required_names, workers, cache_path)
 
 
 if __name__ == "__main__":
+    # Needed for the process pool in the PyInstaller executable
+    multiprocessing.freeze_support()
     main()